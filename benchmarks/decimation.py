@@ -0,0 +1,49 @@
+"""Receive cost of lidar frames with and without a rate limited subscription.
+
+Feeds the corpus frames through the data channel "message" handler of a
+lidar subscription that decodes inline, with no limit, every_nth and max_hz:
+
+    python -m benchmarks.decimation --frames 200
+"""
+import argparse
+import asyncio
+import time
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from .dispatch import LoopbackPeerConnection
+from .lidar_corpus import load_corpus
+
+LIDAR_TOPIC = "rt/utlidar/voxel_map_compressed"
+
+
+async def receive(frames, count, **limits):
+    datachannel = WebRTCDataChannel(None, LoopbackPeerConnection())
+    received = []
+    datachannel.pub_sub.subscribe(LIDAR_TOPIC, received.append, **limits)
+    on_message = datachannel.channel.listeners("message")[0]
+
+    start = time.perf_counter()
+    for i in range(count):
+        await on_message(frames[i % len(frames)])
+    elapsed = time.perf_counter() - start
+    return elapsed / count * 1000, len(received)
+
+
+async def run(count):
+    frames = load_corpus()
+    await receive(frames, len(frames))  # warm up the wasm decoder
+
+    for name, limits in (("unlimited", {}), ("every_nth=10", {"every_nth": 10}), ("max_hz=5", {"max_hz": 5})):
+        per_frame_ms, delivered = await receive(frames, count, **limits)
+        print(f"{name:<13} {per_frame_ms:7.3f} ms/frame received, {delivered}/{count} delivered")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.frames))
+
+
+if __name__ == "__main__":
+    main()
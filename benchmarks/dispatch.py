@@ -0,0 +1,90 @@
+"""Per-message cost of dispatching received data channel messages.
+
+Feeds lowstate messages to a subscribed WebRTCDataChannel through its
+"message" handler, as aiortc would, and reports the time per message, the
+time spent in pub_sub.run_resolve alone, also fanned out to --streams
+non-consuming streams, and the dispatch path counters:
+
+    python -m benchmarks.dispatch --messages 20000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from pyee.asyncio import AsyncIOEventEmitter
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from go2_webrtc_driver.constants import RTC_TOPIC
+from .state_samples import lowstate_message
+
+
+class LoopbackChannel(AsyncIOEventEmitter):
+    """Stands in for the aiortc data channel, sent messages are dropped."""
+
+    readyState = "open"
+
+    def send(self, message):
+        pass
+
+
+class LoopbackPeerConnection:
+    def createDataChannel(self, label):
+        return LoopbackChannel()
+
+
+async def run(messages, streams_count):
+    datachannel = WebRTCDataChannel(None, LoopbackPeerConnection())
+    received = []
+    datachannel.pub_sub.subscribe(RTC_TOPIC["LOW_STATE"], received.append)
+
+    # The handler is a coroutine function, call it directly like pyee would
+    on_message = datachannel.channel.listeners("message")[0]
+    encoded = [json.dumps(lowstate_message(seed)) for seed in range(100)]
+
+    start = time.perf_counter()
+    for i in range(messages):
+        await on_message(encoded[i % len(encoded)])
+    elapsed = time.perf_counter() - start
+
+    assert len(received) == messages
+    print(f"lowstate on_message  {elapsed / messages * 1e6:7.2f} us/message")
+
+    parsed = [json.loads(message) for message in encoded]
+    start = time.perf_counter()
+    for i in range(messages):
+        datachannel.pub_sub.run_resolve(parsed[i % len(parsed)])
+    elapsed = time.perf_counter() - start
+    print(f"lowstate run_resolve {elapsed / messages * 1e6:7.2f} us/message")
+
+    if hasattr(datachannel.pub_sub, "get_latest"):
+        get_latest = datachannel.pub_sub.get_latest
+        start = time.perf_counter()
+        for i in range(messages):
+            get_latest(RTC_TOPIC["LOW_STATE"])
+        elapsed = time.perf_counter() - start
+        print(f"lowstate get_latest  {elapsed / messages * 1e6:7.2f} us/call")
+
+    if hasattr(datachannel.pub_sub, "stream"):
+        # Fan out to slow streams that never consume, they drop instead of stalling
+        streams = [datachannel.pub_sub.stream(RTC_TOPIC["LOW_STATE"], maxsize=10) for _ in range(streams_count)]
+        start = time.perf_counter()
+        for i in range(messages):
+            datachannel.pub_sub.run_resolve(parsed[i % len(parsed)])
+        elapsed = time.perf_counter() - start
+        print(f"lowstate run_resolve {elapsed / messages * 1e6:7.2f} us/message with {streams_count} streams, "
+              f"dropped {[stream.dropped for stream in streams]}")
+    if hasattr(datachannel, "get_dispatch_stats"):
+        print(f"paths: {datachannel.get_dispatch_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--streams", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.streams))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Per-message JSON cost of each installed data channel codec.
+
+Decodes received lowstate and sportmodestate messages (as str, and as bytes
+like binary message headers) and encodes a publish request:
+
+    python -m benchmarks.json_codec --repeat 2000
+"""
+import argparse
+import time
+
+from go2_webrtc_driver import json_codec
+from go2_webrtc_driver.constants import DATA_CHANNEL_TYPE, RTC_TOPIC, SPORT_CMD
+from .state_samples import encoded_samples
+
+
+def per_call_us(function, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    samples = encoded_samples(10)
+    request = {
+        "type": DATA_CHANNEL_TYPE["REQUEST"],
+        "topic": RTC_TOPIC["SPORT_MOD"],
+        "data": {"header": {"identity": {"id": 123456789, "api_id": SPORT_CMD["Move"]}},
+                 "parameter": '{"x": 0.5, "y": 0, "z": 0}'},
+    }
+
+    for backend in json_codec.BACKENDS:
+        try:
+            json_codec.use_backend(backend)
+        except ImportError:
+            print(f"{backend:<8} not installed")
+            continue
+
+        results = []
+        for name, messages in samples.items():
+            encoded = [message.encode("utf-8") for message in messages]
+            results.append(f"{name} {per_call_us(json_codec.loads, messages, args.repeat):6.2f} us")
+            results.append(f"{name} bytes {per_call_us(json_codec.loads, encoded, args.repeat):6.2f} us")
+        results.append(f"request dumps {per_call_us(json_codec.dumps, [request], args.repeat * 10):6.2f} us")
+        print(f"{backend:<8} " + "   ".join(results))
+
+    json_codec.use_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Parity and speed of the "wasm" and "numpy" LidarDecoder backends.
+
+Every frame is decoded by both backends and the outputs are compared byte for
+byte before timing. tests/test_lidar_backends.py checks the same on the
+recorded corpus for every output:
+
+    python -m benchmarks.lidar_backends --frames 20 --repeat 10
+"""
+import argparse
+import sys
+import numpy as np
+
+from go2_webrtc_driver.lidar.lidar_decoder import LidarDecoder
+from .lidar_frames import synthesize_voxel_frame
+from .timing import time_decode
+
+
+def check_parity(decoders, frames):
+    """Return the number of frames where the backends disagree."""
+    mismatches = 0
+    for index, (payload, message) in enumerate(frames):
+        results = [decoder.decode(payload, message["data"]) for decoder in decoders]
+        reference = results[0]
+        for result in results[1:]:
+            for key, expected in reference.items():
+                actual = result[key]
+                same = (
+                    np.array_equal(actual, expected) and actual.dtype == expected.dtype
+                    if isinstance(expected, np.ndarray) else actual == expected
+                )
+                if not same:
+                    print(f"frame {index}: '{key}' differs")
+                    mismatches += 1
+                    break
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = [
+        synthesize_voxel_frame(seed, origin=(0.0, 0.0, -1.0 + 0.1 * seed), tail_noise=0.5 if seed % 4 == 3 else 0.0)
+        for seed in range(args.frames)
+    ]
+    decoders = {backend: LidarDecoder(backend=backend) for backend in ("wasm", "numpy")}
+
+    mismatches = check_parity(list(decoders.values()), frames)
+    print(f"parity: {len(frames) - mismatches}/{len(frames)} frames identical")
+
+    for backend, decoder in decoders.items():
+        samples = time_decode(decoder, frames, args.repeat)
+        print(f"{backend:<8} p50 {np.percentile(samples, 50):8.3f} ms   "
+              f"p99 {np.percentile(samples, 99):8.3f} ms   "
+              f"{1000.0 / samples.mean():8.1f} frames/s")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Per-frame ``LidarDecoder.decode`` against ``decode_many`` over the corpus.
+
+Both build the same concatenated arrays for all frames, the per-frame path
+by concatenating the results of decode:
+
+    python -m benchmarks.lidar_batch --repeat 20
+"""
+import argparse
+import time
+import numpy as np
+
+from go2_webrtc_driver.lidar.lidar_decoder import LidarDecoder
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from .lidar_corpus import CORPUS_DIR, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", choices=("points", "mesh"), default="points")
+    args = parser.parse_args()
+
+    frames = []
+    for raw in load_corpus(args.corpus):
+        message, payload = WebRTCDataChannel.parse_array_buffer(raw)
+        frames.append((payload, message["data"]))
+    frames *= args.repeat
+
+    for backend in ("wasm", "numpy"):
+        decoder = LidarDecoder(backend=backend)
+
+        start = time.perf_counter()
+        results = [decoder.decode(payload, data, output=args.output) for payload, data in frames]
+        for key in ("points",) if args.output == "points" else ("positions", "uvs", "indices"):
+            np.concatenate([result[key] for result in results])
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoder.decode_many(frames, output=args.output)
+        batch = time.perf_counter() - start
+
+        print(f"{backend:<6} decode {len(frames) / single:8.1f} frames/s   "
+              f"decode_many {len(frames) / batch:8.1f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Corpus of ``rt/utlidar/voxel_map_compressed`` frames for the lidar benchmarks.
+
+Every ``.bin`` file in the corpus directory is one binary data channel message
+exactly as the robot sends it: the lidar header, the JSON header and the LZ4
+voxel map. Frames recorded with ``benchmarks.record_lidar`` can be dropped in
+next to the shipped ones. The shipped frames are synthetic and can be rebuilt
+with:
+
+    python -m benchmarks.lidar_corpus --synthesize 8
+"""
+import argparse
+import glob
+import os
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "lidar")
+
+
+def load_corpus(directory=CORPUS_DIR):
+    """Return the raw messages of every .bin file in directory, sorted by name."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.bin"))):
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    if not frames:
+        raise FileNotFoundError(f"No lidar frames (*.bin) in {directory}")
+    return frames
+
+
+def write_frame(directory, name, raw):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.bin")
+    with open(path, "wb") as f:
+        f.write(raw)
+    return path
+
+
+def synthesize_corpus(directory, count):
+    from .lidar_frames import synthesize_voxel_frame, pack_lidar_message
+
+    for seed in range(count):
+        # Mix in frames that end with an incompressible literal run
+        payload, message = synthesize_voxel_frame(
+            seed, origin=(0.0, 0.0, -1.0 + 0.25 * seed), tail_noise=0.5 if seed % 4 == 3 else 0.0
+        )
+        print(write_frame(directory, f"synthetic_{seed:03d}", pack_lidar_message(message, payload)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthesize", type=int, metavar="N", required=True,
+                        help="write N synthetic frames")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    args = parser.parse_args()
+    synthesize_corpus(args.corpus, args.synthesize)
+
+
+if __name__ == "__main__":
+    main()
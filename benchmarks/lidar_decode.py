@@ -0,0 +1,37 @@
+"""Per-frame latency of ``LidarDecoder.decode``.
+
+Run from the repository root:
+
+    python -m benchmarks.lidar_decode --frames 20 --repeat 10
+"""
+import argparse
+import numpy as np
+
+from go2_webrtc_driver.lidar.lidar_decoder import LidarDecoder
+from .lidar_frames import synthesize_voxel_frame
+from .timing import time_decode
+
+
+def report(name, samples_ms):
+    print(
+        f"{name:<12} p50 {np.percentile(samples_ms, 50):8.3f} ms   "
+        f"p99 {np.percentile(samples_ms, 99):8.3f} ms   "
+        f"{1000.0 / samples_ms.mean():8.1f} frames/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = [synthesize_voxel_frame(seed) for seed in range(args.frames)]
+    decoder = LidarDecoder()
+
+    report("copy", time_decode(decoder, frames, args.repeat, copy=True))
+    report("borrowed", time_decode(decoder, frames, args.repeat, copy=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic ``rt/utlidar/voxel_map_compressed`` frames for the lidar benchmarks.
+
+The Go2 sends its voxel map as an LZ4 block holding a 128 x 128 x 30 occupancy
+bit grid (x fastest, most significant bit first), prefixed with a JSON header.
+Building frames needs the optional ``lz4`` package.
+"""
+import json
+import struct
+import numpy as np
+
+try:
+    import lz4.block
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+GRID_SHAPE = (30, 128, 128)  # z, y, x
+TOPIC = "rt/utlidar/voxel_map_compressed"
+
+
+def synthesize_voxel_frame(seed=0, origin=(0.0, 0.0, -0.4), resolution=0.05, tail_noise=0.0):
+    """
+    Build a ground plane with boxes and sparse noise, return (payload, message).
+
+    tail_noise fills the top layer with random bits at that density. This leaves
+    an incompressible literal run at the end of the LZ4 block.
+    """
+    if lz4 is None:
+        raise RuntimeError("Synthesizing voxel frames requires the 'lz4' package")
+
+    rng = np.random.default_rng(seed)
+    occupancy = np.zeros(GRID_SHAPE, dtype=bool)
+
+    ground = int(rng.integers(2, 5))
+    occupancy[ground] = rng.random(GRID_SHAPE[1:]) < rng.uniform(0.3, 0.8)
+    for _ in range(6):
+        x0, y0 = rng.integers(0, 110, 2)
+        w, h = rng.integers(3, 18, 2)
+        top = int(rng.integers(ground + 3, GRID_SHAPE[0]))
+        occupancy[ground:top, y0:y0 + h, x0:x0 + w] = True
+    occupancy |= rng.random(GRID_SHAPE) < 0.01
+    if tail_noise:
+        occupancy[-1] = rng.random(GRID_SHAPE[1:]) < tail_noise
+
+    raw = np.packbits(occupancy.reshape(-1)).tobytes()
+    payload = lz4.block.compress(raw, store_size=False)
+
+    message = {
+        "type": "msg",
+        "topic": TOPIC,
+        "data": {
+            "stamp": 1700000000.0 + seed * 0.1,
+            "frame_id": "odom",
+            "resolution": resolution,
+            "src_size": len(raw),
+            "origin": list(origin),
+            "width": [GRID_SHAPE[2], GRID_SHAPE[1], GRID_SHAPE[0]],
+        },
+    }
+    return payload, message
+
+
+def pack_lidar_message(message, payload):
+    """Frame a header and payload the way the robot sends lidar on the data channel."""
+    header = json.dumps(message).encode("utf-8")
+    return struct.pack("<HHII", 2, 0, len(header), 0) + header + payload
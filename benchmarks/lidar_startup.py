@@ -0,0 +1,64 @@
+"""Import time of the data channel module and time to the first decoded lidar frame.
+
+Each measurement runs in a fresh interpreter. "cold" starts with an empty wasm
+module cache, "warm" reuses the entry written by the cold run:
+
+    python -m benchmarks.lidar_startup --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import go2_webrtc_driver.webrtc_datachannel
+print(time.perf_counter() - start)
+"""
+
+FIRST_FRAME_SNIPPET = """
+import time
+from benchmarks.lidar_frames import synthesize_voxel_frame, pack_lidar_message
+raw = pack_lidar_message(*reversed(synthesize_voxel_frame(0)))
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+start = time.perf_counter()
+WebRTCDataChannel.deal_array_buffer(raw)
+print(time.perf_counter() - start)
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_snippet(snippet, cache_dir):
+    env = dict(os.environ, GO2_WASM_CACHE_DIR=cache_dir, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, "-c", snippet], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000.0
+
+
+def report(name, samples_ms):
+    print(f"{name:<24} median {np.median(samples_ms):9.1f} ms   min {np.min(samples_ms):9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, cold, warm = [], [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            imports.append(run_snippet(IMPORT_SNIPPET, cache_dir))
+            cold.append(run_snippet(FIRST_FRAME_SNIPPET, cache_dir))
+            warm.append(run_snippet(FIRST_FRAME_SNIPPET, cache_dir))
+
+    report("import datachannel", np.array(imports))
+    report("first frame (cold cache)", np.array(cold))
+    report("first frame (warm cache)", np.array(warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Lidar decode benchmark over the recorded-frame corpus.
+
+Measures three paths for every frame in the corpus:
+
+  parse_array_buffer WebRTCDataChannel.parse_array_buffer, framing and header only
+  deal_array_buffer  WebRTCDataChannel.deal_array_buffer, header parsing included
+  decode             LidarDecoder.decode on the already split payload
+
+and reports p50/p99 latency, frames per second and the bytes Python allocates
+per frame (tracemalloc, in a separate untimed pass). Results are written as
+JSON so runs can be compared:
+
+    python -m benchmarks.lidar_suite --repeat 20 --output results.json
+    python -m benchmarks.lidar_suite --baseline results.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+import numpy as np
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel, get_decoder
+from .lidar_corpus import CORPUS_DIR, load_corpus
+from .timing import time_frames
+
+
+def decode_path():
+    decoder = get_decoder()
+
+    def run(raw, parsed):
+        message, payload = parsed
+        return decoder.decode(payload, message["data"])
+    return run
+
+
+def deal_array_buffer_path():
+    def run(raw, parsed):
+        return WebRTCDataChannel.deal_array_buffer(raw)
+    return run
+
+
+def parse_array_buffer_path():
+    def run(raw, parsed):
+        return WebRTCDataChannel.parse_array_buffer(raw)
+    return run
+
+
+PATHS = {
+    "parse_array_buffer": parse_array_buffer_path,
+    "deal_array_buffer": deal_array_buffer_path,
+    "decode": decode_path,
+}
+
+
+def measure_allocations(run, frames):
+    """Peak and retained bytes allocated by Python per frame, medians over the corpus."""
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for raw, parsed in frames:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = run(raw, parsed)
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+            del result
+    finally:
+        tracemalloc.stop()
+    return int(np.median(peaks)), int(np.median(retained))
+
+
+def package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def run_suite(frames, repeat, warmup):
+    results = {}
+    for name, make_run in PATHS.items():
+        run = make_run()
+        for raw, parsed in frames[:warmup]:
+            run(raw, parsed)
+
+        samples = time_frames(run, frames, repeat)
+        peak_bytes, retained_bytes = measure_allocations(run, frames)
+        results[name] = {
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p99_ms": float(np.percentile(samples, 99)),
+            "frames_per_s": float(1000.0 / samples.mean()),
+            "alloc_peak_bytes_per_frame": peak_bytes,
+            "alloc_retained_bytes_per_frame": retained_bytes,
+            "samples": int(samples.size),
+        }
+    return results
+
+
+def report(results, baseline=None):
+    for name, result in results.items():
+        line = (f"{name:<18} p50 {result['p50_ms']:8.3f} ms   p99 {result['p99_ms']:8.3f} ms   "
+                f"{result['frames_per_s']:8.1f} frames/s   "
+                f"{result['alloc_peak_bytes_per_frame'] / 1024:9.1f} KiB peak/frame")
+        previous = (baseline or {}).get(name)
+        if previous:
+            change = 100.0 * (result["p50_ms"] / previous["p50_ms"] - 1.0)
+            line += f"   p50 {change:+6.1f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file from an earlier run")
+    args = parser.parse_args()
+
+    raw_frames = load_corpus(args.corpus)
+    frames = [(raw, WebRTCDataChannel.parse_array_buffer(raw)) for raw in raw_frames]
+
+    results = run_suite(frames, args.repeat, args.warmup)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+
+    if args.output:
+        document = {
+            "timestamp": time.time(),
+            "corpus": {
+                "path": args.corpus,
+                "frames": len(raw_frames),
+                "bytes": sum(len(raw) for raw in raw_frames),
+            },
+            "repeat": args.repeat,
+            "environment": {
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "numpy": np.__version__,
+                "wasmtime": package_version("wasmtime"),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Send path cost per message, dict encoding against MessageTemplate.
+
+Sends heartbeat, Move and subscribe messages through publish_without_callback
+(build the dict, encode all of it) and publish_template (encode the fields
+only) on a loopback channel, for each installed JSON backend. Checks that
+both send the same text:
+
+    python -m benchmarks.message_templates --repeat 20000
+"""
+import argparse
+import time
+
+from go2_webrtc_driver import json_codec
+from go2_webrtc_driver.constants import DATA_CHANNEL_TYPE, RTC_TOPIC, SPORT_CMD
+from go2_webrtc_driver.msgs.pub_sub import WebRTCDataChannelPubSub
+from go2_webrtc_driver.msgs.message_template import Field, JsonTemplate, MessageTemplate
+from .dispatch import LoopbackChannel
+
+
+class RecordingChannel(LoopbackChannel):
+    last = None
+
+    def send(self, message):
+        self.last = message
+
+
+def per_call_us(function, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        function(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def cases(pub_sub):
+    # Made here, templates are encoded with the backend in use
+    heartbeat = MessageTemplate(DATA_CHANNEL_TYPE["HEARTBEAT"], "", {"timeInStr": Field("timeInStr"), "timeInNum": Field("timeInNum")})
+    move = MessageTemplate(DATA_CHANNEL_TYPE["REQUEST"], RTC_TOPIC["SPORT_MOD"], {
+        "header": {"identity": {"id": Field("id"), "api_id": SPORT_CMD["Move"]}},
+        "parameter": JsonTemplate({"x": Field("x"), "y": Field("y"), "z": Field("z")}),
+    })
+    subscribe = MessageTemplate(DATA_CHANNEL_TYPE["SUBSCRIBE"])
+    time_str = "2024-05-01 12:00:00"
+
+    return {
+        "heartbeat": (
+            lambda i: pub_sub.publish_without_callback("", {"timeInStr": time_str, "timeInNum": 1714564800 + i}, DATA_CHANNEL_TYPE["HEARTBEAT"]),
+            lambda i: pub_sub.publish_template(heartbeat, timeInStr=time_str, timeInNum=1714564800 + i),
+        ),
+        "move": (
+            lambda i: pub_sub.publish_without_callback(RTC_TOPIC["SPORT_MOD"], {
+                "header": {"identity": {"id": 1000 + i, "api_id": SPORT_CMD["Move"]}},
+                "parameter": json_codec.dumps({"x": 0.5 + i % 7 / 10, "y": 0.0, "z": -0.25}),
+            }, DATA_CHANNEL_TYPE["REQUEST"]),
+            lambda i: pub_sub.publish_template(move, id=1000 + i, x=0.5 + i % 7 / 10, y=0.0, z=-0.25),
+        ),
+        "subscribe": (
+            lambda i: pub_sub.publish_without_callback(topic=RTC_TOPIC["LOW_STATE"], msg_type=DATA_CHANNEL_TYPE["SUBSCRIBE"]),
+            lambda i: pub_sub.publish_template(subscribe, topic=RTC_TOPIC["LOW_STATE"]),
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    channel = RecordingChannel()
+    pub_sub = WebRTCDataChannelPubSub(channel)
+
+    for backend in json_codec.BACKENDS:
+        try:
+            json_codec.use_backend(backend)
+        except ImportError:
+            print(f"{backend:<8} not installed")
+            continue
+
+        results = []
+        for name, (with_dict, with_template) in cases(pub_sub).items():
+            for i in (0, 3, 12345):
+                with_dict(i)
+                expected = channel.last
+                with_template(i)
+                assert channel.last == expected, (channel.last, expected)
+            dict_us = per_call_us(with_dict, args.repeat)
+            template_us = per_call_us(with_template, args.repeat)
+            results.append(f"{name} {dict_us:5.2f} -> {template_us:5.2f} us")
+        print(f"{backend:<8} " + "   ".join(results))
+
+    json_codec.use_backend()
+
+
+if __name__ == "__main__":
+    main()
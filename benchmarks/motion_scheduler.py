@@ -0,0 +1,62 @@
+"""Move commands sent for a fast, irregular stream of joystick targets.
+
+Feeds targets at about --input-hz with random gaps for --seconds to the
+data channel MotionScheduler and counts the Move requests that reach the
+(loopback) channel, against what sending every target would cost:
+
+    python -m benchmarks.motion_scheduler --input-hz 200 --rate 20 --seconds 3
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from go2_webrtc_driver.constants import SPORT_CMD
+from .dispatch import LoopbackChannel
+
+
+class CountingChannel(LoopbackChannel):
+    moves = 0
+
+    def send(self, message):
+        if json.loads(message)["data"]["header"]["identity"]["api_id"] == SPORT_CMD["Move"]:
+            CountingChannel.moves += 1
+
+
+class CountingPeerConnection:
+    def createDataChannel(self, label):
+        return CountingChannel()
+
+
+async def run(input_hz, rate, seconds):
+    datachannel = WebRTCDataChannel(None, CountingPeerConnection())
+    motion = datachannel.motion
+    motion.set_rate(rate)
+    loop = asyncio.get_running_loop()
+
+    end = loop.time() + seconds
+    targets = 0
+    while loop.time() < end:
+        motion.set_target(random.uniform(-1, 1), 0, random.uniform(-1, 1))
+        targets += 1
+        await asyncio.sleep(random.expovariate(input_hz))
+    stats = motion.stats()
+    motion.stop()
+
+    print(f"targets {targets} ({targets / seconds:.0f} Hz), Move requests sent {CountingChannel.moves}")
+    print(f"send rate {stats['send_rate_hz']:.1f} Hz (configured {rate}), coalesced {stats['coalesced']}, missed periods {stats['missed']}")
+    print(f"jitter p50 {stats['jitter_p50_us']} us p99 {stats['jitter_p99_us']} us max {stats['max_jitter_us']:.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input-hz", type=float, default=200)
+    parser.add_argument("--rate", type=float, default=20, help="Move commands per second")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.input_hz, args.rate, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Request latency during a receive burst, with and without the receive pipeline.
+
+Delivers a burst of lidar frames (decoded inline) and lowstate messages to the
+data channel "message" handler the way pyee does, one task per message, with
+a few request responses mixed in. Messages come in chunks of --chunk without
+the loop running in between, like several SCTP packets read at once. Runs
+inline and pipelined, each with and without the LidarDecodeExecutor. Reports how long each response took to
+resolve its request, how much topic data was delivered or dropped, and the
+pipeline stage stats:
+
+    python -m benchmarks.receive_pipeline --frames 20 --lowstates 400 --chunk 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from go2_webrtc_driver.constants import DATA_CHANNEL_TYPE, RTC_TOPIC
+from go2_webrtc_driver.lidar.decode_executor import LidarDecodeExecutor
+from .dispatch import LoopbackPeerConnection
+from .lidar_corpus import load_corpus
+from .state_samples import lowstate_message
+
+LIDAR_TOPIC = "rt/utlidar/voxel_map_compressed"
+REQUESTS = 5
+
+
+async def burst(frames, frame_count, lowstate_count, chunk, pipeline, executor=False):
+    datachannel = WebRTCDataChannel(None, LoopbackPeerConnection())
+    if executor:
+        datachannel.set_lidar_decode_executor(LidarDecodeExecutor())
+    if pipeline:
+        datachannel.enable_receive_pipeline(parse_queue_size=4, dispatch_queue_size=64)
+    pub_sub = datachannel.pub_sub
+    on_message = datachannel.channel.listeners("message")[0]
+
+    received = {"lidar": 0, "lowstate": 0}
+    pub_sub.subscribe(LIDAR_TOPIC, lambda message: received.__setitem__("lidar", received["lidar"] + 1))
+    pub_sub.subscribe(RTC_TOPIC["LOW_STATE"], lambda message: received.__setitem__("lowstate", received["lowstate"] + 1))
+
+    requests = [
+        asyncio.ensure_future(pub_sub.publish_request_new(RTC_TOPIC["SPORT_MOD"], {"api_id": 1016, "id": request_id}))
+        for request_id in range(1, REQUESTS + 1)
+    ]
+    await asyncio.sleep(0)
+
+    lowstates = [json.dumps(lowstate_message(seed)) for seed in range(10)]
+    messages = []
+    for i in range(frame_count):
+        messages.append(frames[i % len(frames)])
+        messages.extend(lowstates[j % len(lowstates)] for j in range(lowstate_count // frame_count))
+    # Responses spread over the second half of the burst
+    sent_at = {}
+    for n in range(REQUESTS):
+        response = json.dumps({
+            "type": DATA_CHANNEL_TYPE["RESPONSE"],
+            "topic": RTC_TOPIC["SPORT_MOD"],
+            "data": {"header": {"identity": {"id": n + 1, "api_id": 1016}, "status": {"code": 0}}},
+        })
+        messages.insert(len(messages) // 2 + n * len(messages) // (2 * REQUESTS), response)
+
+    done_at = {}
+    for n, request in enumerate(requests):
+        request.add_done_callback(lambda f, n=n: done_at.__setitem__(n, time.perf_counter()))
+
+    start = time.perf_counter()
+    for i, message in enumerate(messages):
+        if isinstance(message, str) and '"res"' in message:
+            sent_at[len(sent_at)] = time.perf_counter()
+        asyncio.ensure_future(on_message(message))
+        if i % chunk == chunk - 1:
+            await asyncio.sleep(0)
+    await asyncio.gather(*requests)
+    if executor:
+        # Let the frames already handed to the executor finish
+        while datachannel.lidar_decode_executor._in_flight:
+            await asyncio.sleep(0.001)
+    while datachannel.receive_pipeline and (datachannel.receive_pipeline.parse_stage.depth or datachannel.receive_pipeline.dispatch_stage.depth):
+        await asyncio.sleep(0.001)
+    total = time.perf_counter() - start
+
+    latencies = sorted((done_at[n] - sent_at[n]) * 1000 for n in range(REQUESTS))
+    name = ("pipeline" if pipeline else "inline") + ("+executor" if executor else "")
+    print(f"{name:<17} burst {total * 1000:7.1f} ms, "
+          f"request latency max {latencies[-1]:7.2f} ms median {latencies[len(latencies) // 2]:7.2f} ms, "
+          f"delivered lidar {received['lidar']}/{frame_count} lowstate {received['lowstate']}/{lowstate_count}")
+    if pipeline:
+        for stage, stats in datachannel.get_pipeline_stats().items():
+            timing = stats["processing_time"]
+            print(f"  {stage:<8} processed {stats['processed']:5d} dropped {stats['dropped']:4d} max depth {stats['max_depth']:4d} "
+                  f"p50 {timing['p50_us']} us p99 {timing['p99_us']} us")
+        datachannel.disable_receive_pipeline()
+    datachannel.set_lidar_decode_executor(None)
+
+
+async def run(frame_count, lowstate_count, chunk):
+    frames = load_corpus()
+    await burst(frames, 2, 2, chunk, False)  # warm up the wasm decoder
+    await burst(frames, frame_count, lowstate_count, chunk, False)
+    await burst(frames, frame_count, lowstate_count, chunk, True)
+    await burst(frames, frame_count, lowstate_count, chunk, False, executor=True)
+    await burst(frames, frame_count, lowstate_count, chunk, True, executor=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--lowstates", type=int, default=400)
+    parser.add_argument("--chunk", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.frames, args.lowstates, args.chunk))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Record ``rt/utlidar/voxel_map_compressed`` frames from a robot into the corpus.
+
+Connects like the lidar example, turns the lidar on and stores every binary
+data channel message untouched:
+
+    python -m benchmarks.record_lidar --ip 192.168.8.181 --frames 50
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectionMethod
+from .lidar_corpus import CORPUS_DIR, write_frame
+
+TOPIC = "rt/utlidar/voxel_map_compressed"
+
+
+async def record(ip, frames, directory):
+    conn = Go2WebRTCConnection(WebRTCConnectionMethod.LocalSTA, ip=ip)
+    await conn.connect()
+    await conn.datachannel.disableTrafficSaving(True)
+
+    done = asyncio.Event()
+    prefix = time.strftime("recorded_%Y%m%d_%H%M%S")
+    recorded = 0
+
+    # Runs next to the driver's own handler and sees the message before decoding
+    @conn.datachannel.channel.on("message")
+    def on_message(message):
+        nonlocal recorded
+        if not isinstance(message, bytes) or recorded >= frames:
+            return
+        print(write_frame(directory, f"{prefix}_{recorded:03d}", message))
+        recorded += 1
+        if recorded >= frames:
+            done.set()
+
+    conn.datachannel.pub_sub.publish_without_callback("rt/utlidar/switch", "on")
+    conn.datachannel.pub_sub.subscribe(TOPIC, lambda message: None)
+
+    await done.wait()
+    await conn.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ip", required=True)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.FATAL)
+    asyncio.run(record(args.ip, args.frames, args.corpus))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Request throughput over a high latency link, sequential against pipelined.
+
+Answers every request sent on a loopback data channel after --rtt ms, like a
+robot behind a TURN relay, and times --requests sport requests made one at a
+time with publish_request_new and through RequestClient windows:
+
+    python -m benchmarks.request_window --rtt 80 --requests 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from go2_webrtc_driver.webrtc_datachannel import WebRTCDataChannel
+from go2_webrtc_driver.msgs.request_client import RequestClient
+from go2_webrtc_driver.constants import DATA_CHANNEL_TYPE, RTC_TOPIC, SPORT_CMD
+from .dispatch import LoopbackChannel
+
+
+class RemoteRobotChannel(LoopbackChannel):
+    """Answers each request after rtt seconds."""
+
+    rtt = 0.08
+
+    def send(self, message):
+        request = json.loads(message)
+        if request.get("type") != DATA_CHANNEL_TYPE["REQUEST"]:
+            return
+        response = json.dumps({
+            "type": DATA_CHANNEL_TYPE["RESPONSE"],
+            "topic": request["topic"],
+            "data": {"header": {"identity": request["data"]["header"]["identity"], "status": {"code": 0}}, "data": ""},
+        })
+        asyncio.get_running_loop().call_later(self.rtt, lambda: self.emit("message", response))
+
+
+class RemoteRobotPeerConnection:
+    def createDataChannel(self, label):
+        return RemoteRobotChannel()
+
+
+async def run(rtt, count):
+    RemoteRobotChannel.rtt = rtt / 1000
+    datachannel = WebRTCDataChannel(None, RemoteRobotPeerConnection())
+    pub_sub = datachannel.pub_sub
+    options = [{"api_id": SPORT_CMD["Move"], "data": {"x": 0.1 * (i % 5), "y": 0, "z": 0}} for i in range(count)]
+
+    start = time.perf_counter()
+    for option in options:
+        await pub_sub.publish_request_new(RTC_TOPIC["SPORT_MOD"], option)
+    elapsed = time.perf_counter() - start
+    print(f"sequential  {elapsed:6.2f} s  {count / elapsed:7.1f} requests/s")
+
+    for window in (1, 4, 8, 16):
+        client = RequestClient(pub_sub, window=window)
+        start = time.perf_counter()
+        responses = await client.request_many(RTC_TOPIC["SPORT_MOD"], options)
+        elapsed = time.perf_counter() - start
+        assert len(responses) == count and all(response["type"] == DATA_CHANNEL_TYPE["RESPONSE"] for response in responses)
+        print(f"window {window:<4} {elapsed:6.2f} s  {count / elapsed:7.1f} requests/s  {client.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rtt", type=float, default=80, help="round trip time in ms")
+    parser.add_argument("--requests", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(run(args.rtt, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Typed state decoders against walking the message dicts.
+
+Per message cost of LOWSTATE/SPORTMODESTATE decode and StateBuffer.append,
+and of a typical analytic (mean motor temperature over the last N messages)
+computed from the dicts and from a StateBuffer:
+
+    python -m benchmarks.state_decode --messages 1000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+
+from go2_webrtc_driver.msgs.state_types import LOWSTATE, SPORTMODESTATE
+from .state_samples import lowstate_message, sportmodestate_message
+
+
+def per_message_us(function, items):
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def retained_bytes_per_message(function, items):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = [function(item) for item in items]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return (after - before) / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Round trip through JSON so the dicts look like freshly received ones
+    lowstates = [json.loads(json.dumps(lowstate_message(seed)["data"])) for seed in range(args.messages)]
+    sportstates = [json.loads(json.dumps(sportmodestate_message(seed)["data"])) for seed in range(args.messages)]
+
+    print(f"lowstate decode        {per_message_us(LOWSTATE.decode, lowstates):7.2f} us/message")
+    print(f"sportmodestate decode  {per_message_us(SPORTMODESTATE.decode, sportstates):7.2f} us/message")
+
+    buffer = LOWSTATE.buffer(args.messages)
+    print(f"lowstate buffer append {per_message_us(buffer.append, lowstates):7.2f} us/message")
+
+    print(f"lowstate kept as dict    {len(json.dumps(lowstates[0])):6d} B JSON, "
+          f"{retained_bytes_per_message(lambda data: json.loads(json.dumps(data)), lowstates):8.0f} B/message")
+    print(f"lowstate kept in buffer  {LOWSTATE.dtype.itemsize:6d} B/message")
+
+    start = time.perf_counter()
+    from_dicts = [
+        sum(motor["temperature"] for motor in data["motor_state"]) / len(data["motor_state"])
+        for data in lowstates
+    ]
+    dict_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    from_buffer = buffer.array()["motor_temperature"].mean(axis=1)
+    buffer_ms = (time.perf_counter() - start) * 1000
+
+    assert np.allclose(from_dicts, from_buffer)
+    print(f"mean motor temperature over {args.messages} messages: dicts {dict_ms:.3f} ms, buffer {buffer_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Sample ``rt/lf/lowstate`` and ``rt/sportmodestate`` messages for the benchmarks.
+
+Field names and sizes follow what the robot publishes (see the lowstate and
+sportmodestate examples), values are random.
+"""
+import json
+import random
+
+from go2_webrtc_driver.constants import RTC_TOPIC
+
+
+def _floats(rng, count, scale=1.0):
+    return [rng.uniform(-scale, scale) for _ in range(count)]
+
+
+def lowstate_message(seed=0):
+    rng = random.Random(seed)
+    return {
+        "type": "msg",
+        "topic": RTC_TOPIC["LOW_STATE"],
+        "data": {
+            "imu_state": {"rpy": _floats(rng, 3, 3.14)},
+            "motor_state": [
+                {"q": rng.uniform(-3, 3), "temperature": rng.randint(25, 60), "lost": 0, "reserve": [0, 0]}
+                for _ in range(20)
+            ],
+            "bms_state": {
+                "version_high": 1,
+                "version_low": 18,
+                "status": 8,
+                "soc": rng.randint(10, 100),
+                "current": rng.randint(-8000, 2000),
+                "cycle": rng.randint(0, 500),
+                "bq_ntc": [rng.randint(25, 40), rng.randint(25, 40)],
+                "mcu_ntc": [rng.randint(25, 40), rng.randint(25, 40)],
+                "cell_vol": [rng.randint(3500, 4200) for _ in range(15)],
+            },
+            "foot_force": [rng.randint(0, 200) for _ in range(4)],
+            "temperature_ntc1": rng.randint(25, 50),
+            "power_v": rng.uniform(24, 33.6),
+        },
+    }
+
+
+def sportmodestate_message(seed=0):
+    rng = random.Random(seed)
+    return {
+        "type": "msg",
+        "topic": RTC_TOPIC["SPORT_MOD_STATE"],
+        "data": {
+            "stamp": {"sec": 1700000000 + seed, "nanosec": rng.randint(0, 999999999)},
+            "error_code": 0,
+            "imu_state": {
+                "quaternion": _floats(rng, 4),
+                "gyroscope": _floats(rng, 3, 2.0),
+                "accelerometer": _floats(rng, 3, 10.0),
+                "rpy": _floats(rng, 3, 3.14),
+                "temperature": rng.randint(30, 60),
+            },
+            "mode": 1,
+            "progress": 0.0,
+            "gait_type": 1,
+            "foot_raise_height": 0.09,
+            "position": _floats(rng, 3, 5.0),
+            "body_height": rng.uniform(0.25, 0.35),
+            "velocity": _floats(rng, 3),
+            "yaw_speed": rng.uniform(-1, 1),
+            "range_obstacle": _floats(rng, 4, 5.0),
+            "foot_force": [rng.randint(0, 200) for _ in range(4)],
+            "foot_position_body": _floats(rng, 12, 0.3),
+            "foot_speed_body": _floats(rng, 12),
+        },
+    }
+
+
+def encoded_samples(count=100):
+    """Return {name: [json str, ...]} as received on the data channel."""
+    return {
+        "lowstate": [json.dumps(lowstate_message(seed)) for seed in range(count)],
+        "sportmodestate": [json.dumps(sportmodestate_message(seed)) for seed in range(count)],
+    }
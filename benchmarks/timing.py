@@ -0,0 +1,19 @@
+"""Per-frame timing shared by the lidar benchmarks."""
+import time
+import numpy as np
+
+
+def time_frames(run, frames, repeat):
+    """Call run(*frame) for every frame, repeat times over, returns the durations in ms."""
+    samples = []
+    for _ in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            run(*frame)
+            samples.append(time.perf_counter() - start)
+    return np.array(samples) * 1000.0
+
+
+def time_decode(decoder, frames, repeat, **decode_kwargs):
+    """time_frames of decoder.decode over (payload, message) frames."""
+    return time_frames(lambda payload, message: decoder.decode(payload, message["data"], **decode_kwargs), frames, repeat)
@@ -0,0 +1,62 @@
+"""Cost of the ``b`` host import (memory copy) that libvoxel.wasm calls while decompressing.
+
+Compares the previous per-byte copy against ``LidarDecoder.copy_within``:
+
+    python -m benchmarks.wasm_memcpy --frames 20 --repeat 10
+"""
+import argparse
+import numpy as np
+
+from go2_webrtc_driver.lidar.lidar_decoder import LidarDecoder
+from .lidar_frames import synthesize_voxel_frame
+from .timing import time_decode
+
+
+class PerByteCopyDecoder(LidarDecoder):
+    """LidarDecoder with the original list-slice and per-byte copy."""
+
+    def copy_within(self, target, start, end):
+        sublist = self.HEAPU8[start:end]
+        for i in range(len(sublist)):
+            if target + i < len(self.HEAPU8):
+                self.HEAPU8[target + i] = sublist[i]
+
+
+class CountingDecoder(LidarDecoder):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.copied = 0
+
+    def copy_within(self, target, start, end):
+        self.calls += 1
+        self.copied += end - start
+        super().copy_within(target, start, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--tail-noise", type=float, default=0.0,
+                        help="density of random bits in the top layer (0.5 forces large host copies)")
+    args = parser.parse_args()
+
+    frames = [synthesize_voxel_frame(seed, tail_noise=args.tail_noise) for seed in range(args.frames)]
+
+    counter = CountingDecoder()
+    for payload, message in frames:
+        counter.decode(payload, message["data"])
+    print(f"host copies per frame: {counter.calls / len(frames):.1f} "
+          f"({counter.copied / len(frames) / 1024:.1f} KiB)")
+
+    before = time_decode(PerByteCopyDecoder(), frames, args.repeat)
+    after = time_decode(LidarDecoder(), frames, args.repeat)
+    for name, samples in (("per-byte", before), ("memmove", after)):
+        print(f"{name:<10} p50 {np.percentile(samples, 50):8.3f} ms   "
+              f"p99 {np.percentile(samples, 99):8.3f} ms")
+    print(f"saved per frame: {np.median(before) - np.median(after):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
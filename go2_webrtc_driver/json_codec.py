@@ -0,0 +1,121 @@
+"""
+JSON codec for the data channel.
+
+Uses orjson or msgspec when one is installed and falls back to the standard
+library. loads() takes str, bytes or memoryview, so binary message headers are
+parsed without decoding them to str first. dumps() returns str, the robot only
+accepts text messages, and takes what json.dumps takes: numpy scalars, NaN
+and non-ASCII text are encoded like the json module encodes them. Likewise
+loads() accepts NaN and Infinity like json.loads.
+
+The backend can be forced with use_backend("json"), or the
+GO2_JSON_BACKEND environment variable.
+"""
+import json
+import os
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+backend = None
+loads = None
+dumps = None
+
+
+def _compatible(fast_dumps):
+    """
+    dumps that sends what json.dumps sends. orjson and msgspec raise on types
+    the json module takes, like numpy.float64, write non-ASCII text unescaped
+    and NaN as null, those messages are encoded by json.dumps instead.
+    """
+
+    def compatible_dumps(obj):
+        try:
+            text = fast_dumps(obj)
+        except TypeError:
+            return json.dumps(obj)
+        if not text.isascii() or "null" in text:
+            return json.dumps(obj)
+        return text
+
+    return compatible_dumps
+
+
+def _tolerant(fast_loads, error):
+    """
+    loads that accepts what json.loads accepts. orjson and msgspec reject
+    NaN and Infinity, a message they fail on is parsed by json.loads, which
+    raises json.JSONDecodeError if it is not JSON either.
+    """
+
+    def tolerant_loads(data):
+        try:
+            return fast_loads(data)
+        except error:
+            if isinstance(data, memoryview):
+                data = bytes(data)
+            return json.loads(data)
+
+    return tolerant_loads
+
+
+def _orjson_codec():
+    import orjson
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def orjson_dumps(obj):
+        return orjson.dumps(obj, option=options).decode("utf-8")
+
+    return _tolerant(orjson.loads, orjson.JSONDecodeError), _compatible(orjson_dumps)
+
+
+def _msgspec_codec():
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+
+    def msgspec_dumps(obj):
+        return encoder.encode(obj).decode("utf-8")
+
+    return _tolerant(decoder.decode, msgspec.DecodeError), _compatible(msgspec_dumps)
+
+
+def _json_codec():
+    def json_loads(data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    return json_loads, json.dumps
+
+
+_CODECS = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _json_codec,
+}
+
+
+def use_backend(name=None):
+    """
+    Switch the codec, name is one of BACKENDS. None picks the first one that
+    is installed. Raises ImportError if the requested backend is missing.
+    """
+    global backend, loads, dumps
+
+    if name is None:
+        for candidate in BACKENDS:
+            try:
+                return use_backend(candidate)
+            except ImportError:
+                continue
+
+    if name not in _CODECS:
+        raise ValueError(f"invalid JSON backend: {name}")
+    loads, dumps = _CODECS[name]()
+    backend = name
+    return name
+
+
+use_backend(os.environ.get("GO2_JSON_BACKEND") or None)
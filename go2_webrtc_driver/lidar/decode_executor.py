@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .lidar_decoder import LidarDecoder
+
+logger = logging.getLogger(__name__)
+
+# One decoder per worker thread (or per worker process when using processes)
+_worker_state = threading.local()
+
+
+def _decode_in_worker(backend, compressed_data, data, lidar_filter=None):
+    decoders = getattr(_worker_state, "decoders", None)
+    if decoders is None:
+        decoders = _worker_state.decoders = {}
+    decoder = decoders.get(backend)
+    if decoder is None:
+        decoder = decoders[backend] = LidarDecoder(backend=backend)
+    if lidar_filter:
+        return lidar_filter.decode(decoder, compressed_data, data)
+    return decoder.decode(compressed_data, data)
+
+
+class LidarDecodeExecutor:
+    """
+    Decodes lidar frames on a worker pool instead of the asyncio loop.
+
+    Every topic keeps at most max_pending frames waiting for a worker. When a
+    newer frame arrives the oldest waiting one is dropped, so consumers always
+    get recent data. Frames are only handed to the pool when a worker is free.
+    Decoded messages are delivered on the event loop, in order per topic.
+    """
+
+    def __init__(self, max_workers=1, max_pending=1, use_processes=False, backend="wasm"):
+        if max_workers < 1 or max_pending < 1:
+            raise ValueError("max_workers and max_pending must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self.backend = backend
+
+        self.queued = 0
+        self.dropped = 0
+        self.decoded = 0
+        self.failed = 0
+
+        self._executor = None
+        self._pending = {}  # topic -> deque of (sequence, message, compressed_data, callback, lidar_filter)
+        self._topics = deque()  # round-robin order of topics with waiting frames
+        self._delivered = {}  # topic -> sequence of the newest delivered frame
+        self._in_flight = 0
+
+    def submit(self, message, compressed_data, callback, lidar_filter=None):
+        """
+        Queue a frame for decoding. Must be called from the event loop.
+
+        callback(message) is called on the loop once message["data"]["data"]
+        holds the decoded frame, filtered by lidar_filter if given.
+        """
+        topic = message.get("topic", "")
+        queue = self._pending.get(topic)
+        if queue is None:
+            queue = self._pending[topic] = deque()
+
+        if not queue:
+            self._topics.append(topic)
+        elif len(queue) >= self.max_pending:
+            queue.popleft()
+            self.dropped += 1
+        queue.append((self.queued, message, compressed_data, callback, lidar_filter))
+        self.queued += 1
+
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._in_flight < self.max_workers and self._topics:
+            if self._executor is None:
+                self._executor = self._create_executor()
+
+            topic = self._topics.popleft()
+            queue = self._pending[topic]
+            sequence, message, compressed_data, callback, lidar_filter = queue.popleft()
+            if queue:
+                self._topics.append(topic)
+
+            if self.use_processes and isinstance(compressed_data, memoryview):
+                # Bodies are views into the received message, which can't be pickled
+                compressed_data = compressed_data.tobytes()
+
+            self._in_flight += 1
+            future = asyncio.get_event_loop().run_in_executor(self._executor, _decode_in_worker, self.backend, compressed_data, message["data"], lidar_filter)
+            future.add_done_callback(lambda f, s=sequence, m=message, c=callback: self._on_done(f, s, m, c))
+
+    def _create_executor(self):
+        if self.use_processes:
+            # wasmtime does not survive a fork, start clean interpreters instead
+            return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lidar-decode")
+
+    def _on_done(self, future, sequence, message, callback):
+        self._in_flight -= 1
+        topic = message.get("topic", "")
+        try:
+            message["data"]["data"] = future.result()
+        except Exception:
+            self.failed += 1
+            logger.error("Failed to decode lidar frame on %s", topic, exc_info=True)
+        else:
+            self.decoded += 1
+            # With several workers a frame can finish after a newer one, never deliver it
+            if sequence > self._delivered.get(topic, -1):
+                self._delivered[topic] = sequence
+                callback(message)
+            else:
+                self.dropped += 1
+        finally:
+            self._dispatch()
+
+    def get_stats(self):
+        """Return the frame counters and the current backlog."""
+        return {
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "decoded": self.decoded,
+            "failed": self.failed,
+            "pending": sum(len(queue) for queue in self._pending.values()),
+            "in_flight": self._in_flight,
+        }
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool. Frames still waiting are discarded."""
+        self._pending.clear()
+        self._topics.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
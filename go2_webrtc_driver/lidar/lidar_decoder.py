@@ -21,27 +21,129 @@
 
 import math
 import ctypes
+import hashlib
+import logging
 import numpy as np
 import os
+import tempfile
+from importlib import metadata
 
-from wasmtime import Config, Engine, Store, Module, Instance, Func, FuncType
-from wasmtime import ValType
+from . import voxel_numpy
+from .voxel_numpy import DECOMPRESS_BUFFER_SIZE, decode_voxel_map, decompress_grid
+from .point_cloud import grid_to_points, grids_to_points, mesh_to_vertices
+
+try:
+    from wasmtime import Config, Engine, Store, Module, Instance, Func, FuncType
+    from wasmtime import ValType, Trap
+except ImportError:  # only the "numpy" backend is available
+    Config = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("wasm", "numpy")
+OUTPUTS = ("mesh", "points", "vertices")
+
+WASM_PATH = os.path.join(os.path.dirname(__file__), "libvoxel.wasm")
+
+# Initial wasm arena sizes, buffers grow past these when a frame needs it
+INPUT_BUFFER_SIZE = 61440
+FACE_CAPACITY = 240000
+
+# Bytes of positions, uvs and indices the wasm writes per face
+MESH_BYTES_PER_FACE = {"positions": 12, "uvs": 8, "indices": 24}
+
+def get_module_cache_dir():
+    """Directory for compiled wasm modules, override with GO2_WASM_CACHE_DIR."""
+    cache_dir = os.environ.get("GO2_WASM_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "go2_webrtc_driver")
+
+
+def load_wasm_module(engine, debug_info=False, use_cache=True):
+    """
+    Compile libvoxel.wasm, or load it from the on-disk cache.
+
+    Cache entries are keyed by the wasm hash, the wasmtime version and the
+    engine settings, so upgrading either one simply compiles a new entry.
+    """
+    with open(WASM_PATH, "rb") as f:
+        wasm = f.read()
+
+    if not use_cache:
+        return Module(engine, wasm)
+
+    key = hashlib.sha256(wasm)
+    key.update(f"wasmtime={metadata.version('wasmtime')};debug_info={debug_info}".encode("utf-8"))
+    cache_path = os.path.join(get_module_cache_dir(), f"libvoxel-{key.hexdigest()[:32]}.cwasm")
+
+    if os.path.exists(cache_path):
+        try:
+            return Module.deserialize_file(engine, cache_path)
+        except Exception:
+            logger.warning("Ignoring unreadable wasm cache entry %s", cache_path, exc_info=True)
+
+    module = Module(engine, wasm)
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        # A unique temp file per writer, decode threads may compile at once
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(cache_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(module.serialize())
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        logger.debug("Could not write wasm cache entry %s", cache_path, exc_info=True)
+    return module
 
 
 class LidarDecoder:
-    def __init__(self) -> None:
+    def __init__(self, backend="wasm", debug_info=False, use_cache=True) -> None:
+        """
+        backend selects the voxel map implementation: "wasm" runs libvoxel.wasm
+        through wasmtime, "numpy" uses the vectorized port in voxel_numpy.py.
+        Both produce identical output.
+
+        debug_info and use_cache only apply to the wasm backend. use_cache keeps
+        the compiled module on disk, see load_wasm_module.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"invalid lidar decoder backend: {backend}")
+        self.backend = backend
+
+        if backend == "wasm":
+            self.init_wasm(debug_info, use_cache)
+
+    def init_wasm(self, debug_info=False, use_cache=True):
+        if Config is None:
+            raise ImportError("The wasm lidar decoder backend requires the 'wasmtime' package")
 
         config = Config()
         config.wasm_multi_value = True
-        config.debug_info = True
-        self.store = Store(Engine(config))
+        config.debug_info = debug_info
+        self.engine = Engine(config)
 
-        wasm_path = os.path.join(os.path.dirname(__file__), "libvoxel.wasm")
-        self.module = Module.from_file(self.store.engine, wasm_path)
+        self.module = load_wasm_module(self.engine, debug_info, use_cache)
 
         self.a_callback_type = FuncType([ValType.i32()], [ValType.i32()])
         self.b_callback_type = FuncType([ValType.i32(), ValType.i32(), ValType.i32()], [])
 
+        self.reset_arena(INPUT_BUFFER_SIZE, FACE_CAPACITY)
+
+    def reset_arena(self, input_size, face_capacity):
+        """
+        Start over with a fresh wasm instance and heap buffers of the given sizes.
+
+        Each instance gets its own store, wasmtime only releases an instance's
+        memory together with its store.
+        """
+        self.store = Store(self.engine)
+
         a = Func(self.store, self.a_callback_type, self.adjust_memory_size)
         b = Func(self.store, self.b_callback_type, self.copy_memory_region)
 
@@ -52,6 +154,23 @@ class LidarDecoder:
         self.free = self.instance.exports(self.store)["g"]
         self.wasm_memory = self.instance.exports(self.store)["c"]
 
+        self.bind_heap()
+
+        # name -> capacity in bytes of the heap buffer stored in that attribute
+        self.buffer_sizes = {}
+        self.face_capacity = 0
+
+        # Counters first, so a mesh that overruns its buffers can not reach them
+        self.decompressedSize = self.malloc(self.store, 4)
+        self.faceCount = self.malloc(self.store, 4)
+        self.pointCount = self.malloc(self.store, 4)
+        self.decompressBufferSize = DECOMPRESS_BUFFER_SIZE
+        self.reserve_buffer("decompressBuffer", self.decompressBufferSize)
+        self.reserve_buffer("input", input_size)
+        self.reserve_mesh(face_capacity)
+
+    def bind_heap(self):
+        """(Re)create the heap views over the current wasm linear memory."""
         self.buffer = self.wasm_memory.data_ptr(self.store)
         self.memory_size = self.wasm_memory.data_len(self.store)
 
@@ -66,27 +185,59 @@ class LidarDecoder:
         self.HEAPF32 = (ctypes.c_float * (self.memory_size // 4)).from_address(self.buffer_ptr)
         self.HEAPF64 = (ctypes.c_double * (self.memory_size // 8)).from_address(self.buffer_ptr)
 
-        self.input = self.malloc(self.store, 61440)
-        self.decompressBuffer = self.malloc(self.store, 80000)
-        self.positions = self.malloc(self.store, 2880000)
-        self.uvs = self.malloc(self.store, 1920000)
-        self.indices = self.malloc(self.store, 5760000)
-        self.decompressedSize = self.malloc(self.store, 4)
-        self.faceCount = self.malloc(self.store, 4)
-        self.pointCount = self.malloc(self.store, 4)
-        self.decompressBufferSize = 80000
+        # NumPy view over the same linear memory, used for bulk input/output
+        self.heap = np.frombuffer(self.HEAPU8, dtype=np.uint8)
 
-    def adjust_memory_size(self, t):
-        return len(self.HEAPU8)
+    def reserve_buffer(self, name, size):
+        """
+        Make the heap buffer held in attribute `name` at least size bytes long.
 
-    def copy_within(self, target, start, end):
-        # Copy the sublist for the specified range [start:end]
-        sublist = self.HEAPU8[start:end]
+        Buffers only grow, at least doubling each time, and are reused by the
+        following frames.
+        """
+        capacity = self.buffer_sizes.get(name, 0)
+        if size <= capacity:
+            return getattr(self, name)
+
+        if capacity:
+            self.free(self.store, getattr(self, name))
+            self.buffer_sizes[name] = 0
+
+        capacity = max(size, 2 * capacity)
+        ptr = self.malloc(self.store, capacity)
+        if ptr == 0 and capacity > size:
+            # No room for the headroom, settle for the exact size
+            capacity = size
+            ptr = self.malloc(self.store, capacity)
+        if ptr == 0:
+            raise MemoryError(f"wasm heap can not hold a {size} byte {name} buffer")
+
+        setattr(self, name, ptr)
+        self.buffer_sizes[name] = capacity
+        return ptr
+
+    def reserve_mesh(self, face_count):
+        """Grow the positions, uvs and indices buffers to hold face_count faces."""
+        for name, face_size in MESH_BYTES_PER_FACE.items():
+            self.reserve_buffer(name, face_count * face_size)
+        self.face_capacity = min(self.buffer_sizes[name] // face_size for name, face_size in MESH_BYTES_PER_FACE.items())
 
-        # Replace elements in the list starting from index 'target'
-        for i in range(len(sublist)):
-            if target + i < len(self.HEAPU8):
-                self.HEAPU8[target + i] = sublist[i]
+    def adjust_memory_size(self, requested_size):
+        # emscripten_resize_heap, sbrk only treats a zero return as failure
+        pages = (requested_size - self.memory_size + 65535) // 65536
+        try:
+            self.wasm_memory.grow(self.store, pages)
+        except Exception:
+            return 0
+        self.bind_heap()
+        return 1
+
+    def copy_within(self, target, start, end):
+        # Same clipping as Array.prototype.copyWithin; memmove handles overlap
+        length = min(end, self.memory_size) - start
+        length = min(length, self.memory_size - target)
+        if length > 0:
+            ctypes.memmove(self.buffer_ptr + target, self.buffer_ptr + start, length)
     
     def copy_memory_region(self, t, n, a):
         self.copy_within(t, n, n + a)
@@ -110,47 +261,137 @@ class LidarDecoder:
             raise ValueError(f"invalid type for getValue: {n}")
         
     def add_value_arr(self, start, value):
-        if start + len(value) <= len(self.HEAPU8):
-            for i, byte in enumerate(value):
-                self.HEAPU8[start + i] = byte
+        if start + len(value) <= self.memory_size:
+            self.heap[start:start + len(value)] = np.frombuffer(value, dtype=np.uint8)
         else:
             raise ValueError("Not enough space to insert bytes at the specified index.")
 
-    def decode(self, compressed_data, data):
-        self.add_value_arr(self.input, compressed_data)
+    def _heap_view(self, start, length, dtype, copy):
+        view = self.heap[start:start + length].view(dtype)
+        if copy:
+            return view.copy()
+        view.flags.writeable = False
+        return view
+
+    def decode(self, compressed_data, data, copy=True, output="mesh", with_intensity=False):
+        """
+        Decode a compressed voxel map.
+
+        output selects the result layout:
+          "mesh"      uint8 quad positions and uvs, uint32 indices, in grid units
+          "points"    float32 Nx3 world coordinates of the occupied voxel centres,
+                      plus per point "intensity" when with_intensity is set
+          "vertices"  the mesh with de-duplicated float32 world vertices
+
+        With copy=False the "mesh" arrays are read-only views into the wasm
+        heap. They are only valid until the next call to decode. The numpy
+        backend always returns fresh arrays.
+        """
+        if output not in OUTPUTS:
+            raise ValueError(f"invalid lidar decoder output: {output}")
+
+        if output == "points":
+            return grid_to_points(self.decompress(compressed_data, data), data, with_intensity)
 
+        if self.backend == "numpy":
+            decoded = decode_voxel_map(compressed_data, data)
+        else:
+            decoded = self.decode_wasm(compressed_data, data, copy and output == "mesh")
+
+        if output == "vertices":
+            return mesh_to_vertices(decoded, data)
+        return decoded
+
+    def decode_many(self, frames, output="points", with_intensity=False):
+        """
+        Decode a list of (compressed_data, data) frames in one pass.
+
+        The results of all frames are concatenated in a CSR like layout, the
+        rows of frame i are [offsets[i], offsets[i + 1]):
+          "points"  "points" (and "intensity") as in decode, offsets count points
+          "mesh"    "positions", "uvs" and "indices" as in decode, offsets count
+                    faces and indices stay relative to their own frame
+
+        """
+        if output == "points":
+            grids = [self.decompress(compressed_data, data) for compressed_data, data in frames]
+            return grids_to_points(grids, [data for _, data in frames], with_intensity)
+
+        if output == "mesh":
+            decoded = [self.decode(compressed_data, data) for compressed_data, data in frames]
+            offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+            np.cumsum([result["face_count"] for result in decoded], out=offsets[1:])
+
+            def concatenate(key, dtype):
+                arrays = [result[key] for result in decoded]
+                return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+            return {
+                "frame_count": len(frames),
+                "offsets": offsets,
+                "point_counts": np.array([result["point_count"] for result in decoded], dtype=np.int64),
+                "positions": concatenate("positions", np.uint8),
+                "uvs": concatenate("uvs", np.uint8),
+                "indices": concatenate("indices", np.uint32),
+            }
+
+        raise ValueError(f"invalid lidar decoder batch output: {output}")
+
+    def decompress(self, compressed_data, data):
+        """Decompressed occupancy bit grid of a frame, as a uint8 array."""
+        # Decompression alone is much cheaper than running the wasm mesher
+        if self.backend == "numpy" or voxel_numpy.lz4 is not None:
+            return decompress_grid(compressed_data)
+        # The wasm leaves the decompressed bit grid in its heap
+        self.decode_wasm(compressed_data, data, copy=False)
+        grid_size = max(self.get_value(self.decompressedSize, "i32"), 0)
+        return self.heap[self.decompressBuffer:self.decompressBuffer + grid_size].copy()
+
+    def decode_wasm(self, compressed_data, data, copy=True):
+        self.reserve_buffer("input", len(compressed_data))
         some_v = math.floor(data["origin"][2] / data["resolution"])
 
-        self.generate(
-            self.store,
-            self.input,
-            len(compressed_data),
-            self.decompressBufferSize,
-            self.decompressBuffer,
-            self.decompressedSize, 
-            self.positions,
-            self.uvs,
-            self.indices,          
-            self.faceCount,
-            self.pointCount,        
-            some_v
-        )
-
-        self.get_value(self.decompressedSize, "i32")
-        c = self.get_value(self.pointCount, "i32")
-        u = self.get_value(self.faceCount, "i32")
+        while True:
+            self.add_value_arr(self.input, compressed_data)
+            try:
+                self.generate(
+                    self.store,
+                    self.input,
+                    len(compressed_data),
+                    self.decompressBufferSize,
+                    self.decompressBuffer,
+                    self.decompressedSize, 
+                    self.positions,
+                    self.uvs,
+                    self.indices,          
+                    self.faceCount,
+                    self.pointCount,        
+                    some_v
+                )
+            except Trap:
+                # The mesh ran off the end of linear memory
+                face_count = 2 * self.face_capacity
+            else:
+                face_count = self.get_value(self.faceCount, "i32")
+                if face_count <= self.face_capacity:
+                    break
 
-        positions_slice = self.HEAPU8[self.positions:self.positions + u * 12]
-        positions_copy = bytearray(positions_slice)
-        p = np.frombuffer(positions_copy, dtype=np.uint8)
+            # The wasm does not bound its mesh writes, so an overrun may have
+            # clobbered the heap. Redo the frame on a fresh arena that fits it.
+            logger.debug("Growing the lidar decoder arena to %d faces", face_count)
+            try:
+                self.reset_arena(self.buffer_sizes["input"], face_count)
+            except MemoryError:
+                # Leave a usable decoder behind for the next frame
+                self.reset_arena(INPUT_BUFFER_SIZE, FACE_CAPACITY)
+                raise
 
-        uvs_slice = self.HEAPU8[self.uvs:self.uvs + u * 8]
-        uvs_copy = bytearray(uvs_slice)
-        r = np.frombuffer(uvs_copy, dtype=np.uint8)
+        c = self.get_value(self.pointCount, "i32")
+        u = face_count
 
-        indices_slice = self.HEAPU8[self.indices:self.indices + u * 24]
-        indices_copy = bytearray(indices_slice)
-        o = np.frombuffer(indices_copy, dtype=np.uint32)
+        p = self._heap_view(self.positions, u * 12, np.uint8, copy)
+        r = self._heap_view(self.uvs, u * 8, np.uint8, copy)
+        o = self._heap_view(self.indices, u * 24, np.uint32, copy)
 
         return {
             "point_count": c,
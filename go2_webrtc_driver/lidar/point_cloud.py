@@ -0,0 +1,131 @@
+"""
+World coordinate views of a decoded voxel map.
+
+Grid coordinates map to the world frame as grid * resolution + origin, with
+resolution and origin taken from the message header.
+"""
+import numpy as np
+
+from .voxel_numpy import GRID_SIZE_X, occupied_voxels, layer_shades
+
+
+def _world_transform(data):
+    resolution = np.float32(data["resolution"])
+    origin = np.asarray(data["origin"], dtype=np.float32)
+    return resolution, origin
+
+
+def _voxel_centres_to_world(points, data):
+    """Turn float32 grid coordinates into world voxel centres, in place."""
+    resolution, origin = _world_transform(data)
+    points += np.float32(0.5)
+    points *= resolution
+    points += origin
+
+
+def _intensity(z, data):
+    u, _ = layer_shades(int(z.max(initial=0)) + 1, data)
+    return (u.astype(np.float32) / np.float32(255.0))[z]
+
+
+def grid_to_points(grid, data, with_intensity=False):
+    """
+    Occupied voxels of a decompressed bit grid as an Nx3 float32 array of
+    voxel centres in world coordinates.
+
+    With with_intensity the result also holds "intensity", the per point height
+    shade the Unitree app colours voxels with (texture u coordinate / 255).
+    """
+    x, y, z = occupied_voxels(grid)
+
+    points = np.empty((x.size, 3), dtype=np.float32)
+    points[:, 0] = x
+    points[:, 1] = y
+    points[:, 2] = z
+    _voxel_centres_to_world(points, data)
+
+    result = {
+        "point_count": int(x.size),
+        "points": points,
+    }
+    if with_intensity:
+        result["intensity"] = _intensity(z, data)
+    return result
+
+
+def mesh_to_vertices(decoded, data):
+    """
+    Turn a decoded mesh into shared float32 world vertices.
+
+    Every quad corner appears once in "vertices" and "indices" is remapped to
+    it, so the same corner shared by neighbouring faces is only stored once.
+    """
+    positions = np.asarray(decoded["positions"], dtype=np.uint8).reshape(-1, 3)
+
+    # Corners lie on a (129, 129, layers + 1) lattice, so a dense lookup table
+    # replaces sorting for the de-duplication
+    side = GRID_SIZE_X + 1
+    corner_x = positions[:, 0].astype(np.int64)
+    corner_y = positions[:, 1].astype(np.int64)
+    corner_z = positions[:, 2].astype(np.int64)
+    keys = (corner_z * side + corner_y) * side + corner_x
+    used = np.zeros(int(keys.max(initial=0)) + 1, dtype=bool)
+    used[keys] = True
+    unique_keys = np.flatnonzero(used)
+    remap = np.empty(used.size, dtype=np.uint32)
+    remap[unique_keys] = np.arange(unique_keys.size, dtype=np.uint32)
+
+    resolution, origin = _world_transform(data)
+    vertices = np.empty((unique_keys.size, 3), dtype=np.float32)
+    vertices[:, 0] = unique_keys % side
+    vertices[:, 1] = (unique_keys // side) % side
+    vertices[:, 2] = unique_keys // (side * side)
+    vertices *= resolution
+    vertices += origin
+
+    return {
+        "point_count": decoded["point_count"],
+        "face_count": decoded["face_count"],
+        "vertices": vertices,
+        "indices": remap[keys][decoded["indices"]],
+    }
+
+
+def grids_to_points(grids, datas, with_intensity=False):
+    """
+    grid_to_points over many frames, concatenated into one array.
+
+    The points of frame i are points[offsets[i]:offsets[i + 1]]. Frames are
+    handled one at a time so the temporaries stay small, and the output is
+    allocated once.
+    """
+    # Grid coordinates fit in a byte, keep them compact until the output size is known
+    voxels = []
+    for grid in grids:
+        x, y, z = occupied_voxels(grid)
+        coordinates = np.empty((x.size, 3), dtype=np.uint8)
+        coordinates[:, 0] = x
+        coordinates[:, 1] = y
+        coordinates[:, 2] = z
+        voxels.append(coordinates)
+
+    offsets = np.zeros(len(grids) + 1, dtype=np.int64)
+    np.cumsum([coordinates.shape[0] for coordinates in voxels], out=offsets[1:])
+    points = np.empty((offsets[-1], 3), dtype=np.float32)
+    intensity = np.empty(offsets[-1], dtype=np.float32) if with_intensity else None
+
+    for i, (coordinates, data) in enumerate(zip(voxels, datas)):
+        frame_points = points[offsets[i]:offsets[i + 1]]
+        frame_points[...] = coordinates
+        _voxel_centres_to_world(frame_points, data)
+        if with_intensity:
+            intensity[offsets[i]:offsets[i + 1]] = _intensity(coordinates[:, 2], data)
+
+    result = {
+        "frame_count": len(grids),
+        "offsets": offsets,
+        "points": points,
+    }
+    if with_intensity:
+        result["intensity"] = intensity
+    return result
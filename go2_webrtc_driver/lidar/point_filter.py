@@ -0,0 +1,111 @@
+"""
+Region of interest and downsampling for decoded lidar points.
+
+A LidarFilter is attached to a subscription, see WebRTCDataChannelPubSub.subscribe.
+Frames on that topic are then decoded to world points once and every
+subscriber's filter reduces them before its callback sees them.
+"""
+import numpy as np
+
+
+class LidarFilter:
+    def __init__(self, crop_box=None, height_band=None, voxel_size=None, with_intensity=False):
+        """
+        crop_box     ((x_min, y_min, z_min), (x_max, y_max, z_max)) in world
+                     coordinates, points outside are dropped
+        height_band  (z_min, z_max), a crop on z only
+        voxel_size   merge the points of every voxel_size cube into their
+                     centroid, for a coarser map than the robot sends
+        with_intensity  keep the per point "intensity", averaged when merging
+        """
+        if crop_box is not None:
+            crop_box = np.asarray(crop_box, dtype=np.float32)
+            if crop_box.shape != (2, 3):
+                raise ValueError("crop_box must be ((x_min, y_min, z_min), (x_max, y_max, z_max))")
+        if height_band is not None and len(height_band) != 2:
+            raise ValueError("height_band must be (z_min, z_max)")
+        if voxel_size is not None and voxel_size <= 0:
+            raise ValueError("voxel_size must be positive")
+
+        self.crop_box = crop_box
+        self.height_band = tuple(height_band) if height_band is not None else None
+        self.voxel_size = voxel_size
+        self.with_intensity = with_intensity
+
+    def decode(self, decoder, compressed_data, data):
+        """Decode a frame with decoder and apply the filter to its points."""
+        return self.apply(decoder.decode(compressed_data, data, output="points", with_intensity=self.with_intensity))
+
+    def apply(self, decoded):
+        """
+        Filter the output of LidarDecoder.decode(..., output="points"). The
+        arrays of decoded are not modified, it may be shared by several filters.
+        """
+        points = decoded["points"]
+        intensity = decoded.get("intensity") if self.with_intensity else None
+
+        # Per axis bounds, one pair of comparisons per bounded axis
+        bounds = [[None, None] for _ in range(3)]
+        if self.crop_box is not None:
+            for axis in range(3):
+                bounds[axis] = [self.crop_box[0][axis], self.crop_box[1][axis]]
+        if self.height_band is not None:
+            low, high = bounds[2]
+            bounds[2] = [
+                self.height_band[0] if low is None else max(low, self.height_band[0]),
+                self.height_band[1] if high is None else min(high, self.height_band[1]),
+            ]
+
+        keep = None
+        for axis, (low, high) in enumerate(bounds):
+            if low is None:
+                continue
+            column = points[:, axis]
+            inside = (column >= low) & (column <= high)
+            keep = inside if keep is None else keep & inside
+        if keep is not None:
+            points = points[keep]
+            if intensity is not None:
+                intensity = intensity[keep]
+
+        if self.voxel_size is not None and len(points):
+            points, intensity = downsample(points, self.voxel_size, intensity)
+
+        result = {
+            "point_count": int(len(points)),
+            "points": points,
+        }
+        if intensity is not None:
+            result["intensity"] = intensity
+        return result
+
+
+# Largest number of cells downsample counts in a dense table instead of sorting
+DENSE_CELL_LIMIT = 1 << 22
+
+
+def downsample(points, voxel_size, intensity=None):
+    """Replace the points in every voxel_size cube by their centroid."""
+    cells = np.floor(points / np.float32(voxel_size)).astype(np.int64)
+    cells -= cells.min(axis=0)
+    extent = cells.max(axis=0) + 1
+    keys = (cells[:, 2] * extent[1] + cells[:, 1]) * extent[0] + cells[:, 0]
+
+    if int(np.prod(extent)) <= DENSE_CELL_LIMIT:
+        # Few cells, number the occupied ones through a lookup table
+        dense_counts = np.bincount(keys)
+        occupied = np.flatnonzero(dense_counts)
+        remap = np.empty(dense_counts.size, dtype=np.int64)
+        remap[occupied] = np.arange(occupied.size)
+        cell_index = remap[keys]
+        counts = dense_counts[occupied]
+    else:
+        _, cell_index, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        cell_index = cell_index.reshape(-1)
+
+    centroids = np.empty((counts.size, 3), dtype=np.float32)
+    for axis in range(3):
+        centroids[:, axis] = np.bincount(cell_index, weights=points[:, axis], minlength=counts.size) / counts
+    if intensity is not None:
+        intensity = (np.bincount(cell_index, weights=intensity, minlength=counts.size) / counts).astype(np.float32)
+    return centroids, intensity
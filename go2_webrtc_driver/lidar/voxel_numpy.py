@@ -0,0 +1,194 @@
+"""
+NumPy implementation of the libvoxel.wasm decompress-and-mesh step.
+
+A voxel map is an LZ4 block that holds a 128 x 128 x 30 occupancy bit grid
+(x fastest, most significant bit first). Every occupied voxel emits one quad for
+each of its six faces whose neighbour is empty or out of bounds. The output
+matches libvoxel.wasm byte for byte.
+"""
+import math
+import numpy as np
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+GRID_SIZE_X = 128
+GRID_SIZE_Y = 128
+GRID_SIZE_Z = 30
+
+# Same capacity as the wasm decompress buffer
+DECOMPRESS_BUFFER_SIZE = 80000
+
+# Neighbour offset (dx, dy, dz) of each face, in the order the wasm emits them
+FACE_NORMALS = np.array([
+    [-1, 0, 0],
+    [1, 0, 0],
+    [0, -1, 0],
+    [0, 1, 0],
+    [0, 0, -1],
+    [0, 0, 1],
+], dtype=np.int32)
+
+# Corner offsets of each face quad, four (x, y, z) vertices per face
+FACE_CORNERS = np.array([
+    [0, 1, 0, 0, 0, 0, 0, 1, 1, 0, 0, 1],
+    [1, 1, 1, 1, 0, 1, 1, 1, 0, 1, 0, 0],
+    [1, 0, 1, 0, 0, 1, 1, 0, 0, 0, 0, 0],
+    [0, 1, 1, 1, 1, 1, 0, 1, 0, 1, 1, 0],
+    [1, 0, 0, 0, 0, 0, 1, 1, 0, 0, 1, 0],
+    [0, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1],
+], dtype=np.uint8)
+
+QUAD_INDICES = np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)
+
+
+def lz4_block_decompress(compressed_data, max_size):
+    """Decompress a raw LZ4 block. Raises ValueError on corrupt input or overflow."""
+    if lz4 is not None:
+        try:
+            return lz4.block.decompress(compressed_data, uncompressed_size=max_size)
+        except lz4.block.LZ4BlockError as e:
+            raise ValueError(str(e))
+
+    src = bytes(compressed_data)
+    src_len = len(src)
+    dst = bytearray()
+    i = 0
+    try:
+        while True:
+            token = src[i]
+            i += 1
+
+            literal_length = token >> 4
+            if literal_length == 15:
+                while True:
+                    extra = src[i]
+                    i += 1
+                    literal_length += extra
+                    if extra != 255:
+                        break
+            if i + literal_length > src_len:
+                raise ValueError("Literal run exceeds the input")
+            dst += src[i:i + literal_length]
+            i += literal_length
+            if i == src_len:
+                break
+
+            offset = src[i] | (src[i + 1] << 8)
+            i += 2
+            match_length = token & 15
+            if match_length == 15:
+                while True:
+                    extra = src[i]
+                    i += 1
+                    match_length += extra
+                    if extra != 255:
+                        break
+            match_length += 4
+
+            start = len(dst) - offset
+            if offset == 0 or start < 0:
+                raise ValueError("Invalid match offset")
+            if offset >= match_length:
+                dst += dst[start:start + match_length]
+            else:
+                # Overlapping match repeats the last `offset` bytes
+                pattern = dst[start:]
+                dst += (pattern * (match_length // offset + 1))[:match_length]
+
+            if len(dst) > max_size:
+                raise ValueError("Decompressed data exceeds the buffer")
+    except IndexError:
+        raise ValueError("Truncated LZ4 block")
+
+    if len(dst) > max_size:
+        raise ValueError("Decompressed data exceeds the buffer")
+    return bytes(dst)
+
+
+_quad_indices = np.empty(0, dtype=np.uint32)
+
+
+def quad_indices(face_count):
+    """Triangle indices for face_count quads, copied from a cached template."""
+    global _quad_indices
+    if _quad_indices.size < face_count * 6:
+        count = max(face_count, 2 * _quad_indices.size // 6)
+        _quad_indices = ((np.arange(count, dtype=np.uint32)[:, None] * 4) + QUAD_INDICES).reshape(-1)
+    return _quad_indices[:face_count * 6].copy()
+
+
+def decompress_grid(compressed_data, max_decompressed_size=DECOMPRESS_BUFFER_SIZE):
+    """Occupancy bit grid of a voxel map as uint8, empty if the block is corrupt."""
+    try:
+        grid = lz4_block_decompress(compressed_data, max_decompressed_size)
+    except ValueError:
+        grid = b""
+    return np.frombuffer(grid, dtype=np.uint8)
+
+
+def occupied_voxels(grid):
+    """Grid coordinates (x, y, z) of the set bits, in bit order."""
+    # Only unpack the bytes that hold occupied voxels
+    occupied_bytes = np.flatnonzero(grid)
+    bits = np.flatnonzero(np.unpackbits(grid[occupied_bytes]))
+    voxels = occupied_bytes[bits >> 3] * 8 + (bits & 7)
+    return voxels & (GRID_SIZE_X - 1), (voxels >> 7) & (GRID_SIZE_Y - 1), voxels >> 14
+
+
+def layer_shades(layers, data):
+    """Texture coordinates (u, v) the wasm assigns to each z layer, layer 0 is fixed."""
+    some_v = math.floor(data["origin"][2] / data["resolution"])
+    shade = np.clip(np.arange(layers) + some_v, -10, 20) * 6
+    u = shade + 66
+    v = shade + 60
+    u[0], v[0] = 6, 0
+    return u, v
+
+
+def decode_voxel_map(compressed_data, data, max_decompressed_size=DECOMPRESS_BUFFER_SIZE):
+    """Decode a compressed voxel map, returns the same dict as LidarDecoder.decode."""
+    x, y, z = occupied_voxels(decompress_grid(compressed_data, max_decompressed_size))
+
+    # Occupancy with a one voxel empty border, so neighbour lookups never leave
+    # the array. Layers past GRID_SIZE_Z count as empty like in the wasm.
+    stride_y = GRID_SIZE_X + 2
+    stride_z = (GRID_SIZE_Y + 2) * stride_y
+    layers = int(z.max(initial=0)) + 3
+    cell = (z + 1) * stride_z + (y + 1) * stride_y + (x + 1)
+    padded = np.zeros(layers * stride_z, dtype=bool)
+    padded[cell[z < GRID_SIZE_Z]] = True
+
+    # Visible faces per voxel, flattened in (voxel, face) order like the wasm loop
+    neighbour_offsets = FACE_NORMALS @ np.array([1, stride_y, stride_z])
+    visible = ~padded[cell[:, None] + neighbour_offsets]
+    voxel_index, face_index = np.divmod(np.flatnonzero(visible), 6)
+    face_count = face_index.size
+
+    # Each quad is 12 bytes (x, y, z per corner), built as three little endian
+    # uint32 words. Corner offsets are 0 or 1 and coordinates stay below 255,
+    # so adding the words never carries across bytes.
+    x, y, z = x.astype(np.uint32), y.astype(np.uint32), z.astype(np.uint32)
+    corners = np.stack([
+        x | y << 8 | z << 16 | x << 24,
+        y | z << 8 | x << 16 | y << 24,
+        z | x << 8 | y << 16 | z << 24,
+    ], axis=1)
+    positions = np.take(corners, voxel_index, axis=0) + np.take(FACE_CORNERS.view(np.uint32), face_index, axis=0)
+
+    # Height colouring per layer
+    u, v = layer_shades(layers, data)
+    layer_uvs = np.stack([u, np.zeros_like(u), u, np.full_like(u, 255), v, np.zeros_like(v), v, np.full_like(v, 255)], axis=1)
+    uvs = layer_uvs.astype(np.uint8).view(np.uint64)[z[voxel_index], 0]
+
+    indices = quad_indices(face_count)
+
+    return {
+        "point_count": int(x.size),
+        "face_count": int(face_count),
+        "positions": positions.view(np.uint8).reshape(-1),
+        "uvs": uvs.view(np.uint8),
+        "indices": indices,
+    }
@@ -2,6 +2,8 @@ from ..constants import app_error_messages
 import time
 import logging
 
+logger = logging.getLogger(__name__)
+
 def integer_to_hex_string(error_code):
     """
     Converts an integer error code to a hexadecimal string.
@@ -119,7 +121,7 @@ def handle_error(message):
             # Check if this is a critical error
             if is_critical_error(error_code_int):
                 critical_errors_detected = True
-                logging.warning(f"CRITICAL ERROR DETECTED: {error_code_int}")
+                logger.warning(f"CRITICAL ERROR DETECTED: {error_code_int}")
 
             error_source_text = get_error_source_text(error_source)
             error_code_hex = integer_to_hex_string(error_code_int)
@@ -133,7 +135,7 @@ def handle_error(message):
                 f"🔍 Raw Code:     {error_code_int}")
 
         except Exception as e:
-            logging.error(f"Failed to process error: {error}")
-            logging.error(f"Error details: {str(e)}")
+            logger.error(f"Failed to process error: {error}")
+            logger.error(f"Error details: {str(e)}")
 
     return critical_errors_detected
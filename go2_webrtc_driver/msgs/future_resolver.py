@@ -1,19 +1,210 @@
+import asyncio
 import logging
+import time
 from ..constants import DATA_CHANNEL_TYPE
 from ..util import get_nested_field
 
+logger = logging.getLogger(__name__)
+
+ID_RANGE = 2147483648  # request ids are 31 bit
+
+
+class RequestIdAllocator:
+    def __init__(self, in_use=None):
+        """
+        Request ids of one connection, counting up from the current time in
+        milliseconds and wrapping within 1..ID_RANGE - 1. in_use(id) tells
+        whether an id still waits for its response, those are skipped.
+        """
+        self.last = int(time.time() * 1000) % ID_RANGE
+        self.in_use = in_use
+
+    def next_id(self):
+        while True:
+            # 0 is skipped, a falsy id would not be used as the message key
+            self.last = self.last + 1 if self.last + 1 < ID_RANGE else 1
+            if not (self.in_use and self.in_use(self.last)):
+                return self.last
+
+
 class FutureResolver:
-    def __init__(self):
+    def __init__(self, ttl=60, sweep_interval=10):
         self.pending_responses = {}
-        self.pending_callbacks = {}
+        self.pending_callbacks = {}  # key -> list of futures
+        self.pending_requests = {}  # request id -> future, for requests with unique ids
         self.chunk_data_storage = {}
+        self.pending_key_topics = {}  # key -> topic the futures under it were saved for
+        self.pending_topics = {}  # topic -> number of futures waiting on it, absent when none
+        self.pending_since = {}  # key -> time.monotonic() the first future under it was saved
+        self.chunk_since = {}  # key -> time.monotonic() of the latest chunk of a transfer
+        self.failed_transfers = {}  # key -> time.monotonic() of the latest chunk of a swept transfer
+
+        # Requests unanswered after ttl seconds fail with asyncio.TimeoutError,
+        # checked every sweep_interval seconds while requests are pending
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_timer = None
+        self.expired = 0
+        self.cancelled = 0
+        self.dropped_transfers = 0
 
     def save_resolve(self, message_type, topic, future, identifier):
         key = self.generate_message_key(message_type,topic,identifier)
         if key in self.pending_callbacks:
             self.pending_callbacks[key].append(future)
+        elif key in self.pending_requests:
+            # Caller reused an id still in flight, both wait for the response
+            self.pending_callbacks[key] = [self.pending_requests.pop(key), future]
+        elif message_type == DATA_CHANNEL_TYPE["REQUEST"] and isinstance(identifier, int):
+            # Ids from RequestIdAllocator, exactly one future each
+            self.pending_requests[key] = future
+            self.pending_key_topics[key] = topic
+            self.pending_since[key] = time.monotonic()
         else:
             self.pending_callbacks[key] = [future]
+            self.pending_key_topics[key] = topic
+            self.pending_since[key] = time.monotonic()
+        topic = self.pending_key_topics[key]
+        self.pending_topics[topic] = self.pending_topics.get(topic, 0) + 1
+
+        # A future cancelled by its caller, or by a timeout, leaves right away
+        future.add_done_callback(lambda f: self.discard(key, f))
+        if self.sweep_timer is None:
+            self.start_sweeper()
+
+    def is_pending(self, key):
+        return key in self.pending_requests or key in self.pending_callbacks
+
+    def resolve(self, key, message):
+        """Complete every future waiting under key with message."""
+        future = self.pending_requests.get(key)
+        if future is not None:
+            self.remove(key)
+            if not future.done():
+                future.set_result(message)
+            return
+
+        futures = self.pending_callbacks.get(key)
+        if futures is None:
+            return
+        self.remove(key)
+        for future in futures:
+            if future and not future.done():
+                future.set_result(message)  # Resolve the future with the message
+
+    def remove(self, key, future=None):
+        """Stop tracking future under key, or every future under key."""
+        if key in self.pending_requests:
+            del self.pending_requests[key]
+            del self.pending_since[key]
+            self.release_topic(self.pending_key_topics.pop(key), 1)
+            return
+
+        futures = self.pending_callbacks[key]
+        if future is None:
+            removed = len(futures)
+        else:
+            futures.remove(future)
+            removed = 1
+
+        if future is None or not futures:
+            del self.pending_callbacks[key]
+            del self.pending_since[key]
+            topic = self.pending_key_topics.pop(key)
+        else:
+            topic = self.pending_key_topics[key]
+        self.release_topic(topic, removed)
+
+    def release_topic(self, topic, count):
+        remaining = self.pending_topics[topic] - count
+        if remaining > 0:
+            self.pending_topics[topic] = remaining
+        else:
+            del self.pending_topics[topic]
+
+    def discard(self, key, future):
+        """Done callback of a saved future, forgets it if it was cancelled."""
+        if self.pending_requests.get(key) is future:
+            self.cancelled += 1
+            self.remove(key)
+            return
+        futures = self.pending_callbacks.get(key)
+        if futures and future in futures:
+            self.cancelled += 1
+            self.remove(key, future)
+
+    def sweep(self, ttl=None):
+        """
+        Fail the requests older than ttl seconds (self.ttl by default) with
+        asyncio.TimeoutError and drop chunked transfers that stalled as long.
+        Every chunk restarts both clocks. The remaining chunks of a dropped
+        transfer are rejected, see store_chunk. Returns the number of futures
+        expired.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        deadline = now - ttl
+        expired = 0
+        for key in [key for key, since in self.pending_since.items() if since <= deadline]:
+            expired += self.fail(key, asyncio.TimeoutError(f"No response for {key} within {ttl} s"))
+        for key in [key for key, since in self.failed_transfers.items() if since <= deadline]:
+            del self.failed_transfers[key]
+        for key in [key for key, since in self.chunk_since.items() if since <= deadline]:
+            del self.chunk_since[key]
+            del self.chunk_data_storage[key]
+            self.failed_transfers[key] = now
+            self.dropped_transfers += 1
+            logger.warning("Dropped chunked transfer %s, no chunk within %s s", key, ttl)
+        if expired:
+            logger.warning("Expired %d requests without a response", expired)
+        self.expired += expired
+        return expired
+
+    def fail(self, key, error):
+        """Fail every future under key with error, returns how many were still waiting."""
+        if key in self.pending_requests:
+            futures = [self.pending_requests[key]]
+        elif key in self.pending_callbacks:
+            futures = self.pending_callbacks[key]
+        else:
+            return 0
+        self.remove(key)
+        failed = 0
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+                failed += 1
+        return failed
+
+    def start_sweeper(self):
+        """Sweep every sweep_interval seconds, stops by itself once nothing is pending."""
+        self.stop_sweeper()
+        self.sweep_timer = asyncio.get_event_loop().call_later(self.sweep_interval, self.run_sweeper)
+
+    def stop_sweeper(self):
+        if self.sweep_timer:
+            self.sweep_timer.cancel()
+            self.sweep_timer = None
+
+    def run_sweeper(self):
+        self.sweep_timer = None
+        self.sweep()
+        if self.pending_since or self.chunk_data_storage or self.failed_transfers:
+            self.start_sweeper()
+
+    def get_pending_stats(self):
+        """Gauges of the requests waiting for a response."""
+        now = time.monotonic()
+        oldest = min(self.pending_since.values(), default=None)
+        return {
+            "pending_requests": sum(self.pending_topics.values()),
+            "pending_keys": len(self.pending_since),
+            "oldest_age": now - oldest if oldest is not None else 0.0,
+            "chunked_transfers": len(self.chunk_data_storage),
+            "dropped_transfers": self.dropped_transfers,
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+        }
 
     def run_resolve_for_topic(self, message):
         if not message.get("type"):
@@ -43,23 +234,48 @@ class FutureResolver:
                 raise ValueError("Chunk index is missing")
 
             data_chunk = message["data"].get("data")
+            if not self.store_chunk(key, chunk_index, data_chunk):
+                if chunk_index >= total_chunks:
+                    self.reject_transfer(key)
+                return
             if chunk_index < total_chunks:
-                if key in self.chunk_data_storage:
-                    self.chunk_data_storage[key].append(data_chunk)
-                else:
-                    self.chunk_data_storage[key] = [data_chunk]
                 return
-            else:
-                self.chunk_data_storage[key].append(data_chunk)
-                message["data"]["data"] = self.merge_array_buffers(self.chunk_data_storage[key])
-                del self.chunk_data_storage[key]
+            message["data"]["data"] = self.merge_array_buffers(self.chunk_data_storage.pop(key))
+            del self.chunk_since[key]
 
         # Resolve the pending future with the final message
-        if key in self.pending_callbacks:
-            for future in self.pending_callbacks[key]:
-                if future:
-                    future.set_result(message)  # Resolve the future with the message
-            del self.pending_callbacks[key]
+        self.resolve(key, message)
+
+    def store_chunk(self, key, chunk_index, data_chunk):
+        """
+        Keep a chunk of the transfer under key and restart its clock and the
+        one of the request waiting for it. Returns False for the chunks of a
+        transfer the sweeper dropped, those are not stored, unless chunk 1
+        starts it over.
+        """
+        now = time.monotonic()
+        if key in self.failed_transfers:
+            if chunk_index != 1:
+                self.failed_transfers[key] = now
+                return False
+            del self.failed_transfers[key]
+
+        chunks = self.chunk_data_storage.get(key)
+        if chunks is None:
+            chunks = self.chunk_data_storage[key] = []
+        chunks.append(data_chunk)
+        self.chunk_since[key] = now
+        if key in self.pending_since:
+            self.pending_since[key] = now
+        # A transfer nobody requested must be swept too
+        if self.sweep_timer is None:
+            self.start_sweeper()
+        return True
+
+    def reject_transfer(self, key):
+        """The last chunk of a dropped transfer arrived, fail whoever still waits on it."""
+        del self.failed_transfers[key]
+        self.fail(key, asyncio.TimeoutError(f"Chunked transfer {key} stalled and was dropped"))
 
     def merge_array_buffers(self, buffers):
         total_length = sum(len(buf) for buf in buffers)
@@ -95,24 +311,19 @@ class FutureResolver:
             # Extract the chunk data
             data_chunk = file_info.get("data")
 
-            # Initialize the key in chunk_data_storage if it doesn't exist
-            if key not in self.chunk_data_storage:
-                self.chunk_data_storage[key] = []
-
-            # Append the chunk to the storage, ensuring it's in bytes
-            self.chunk_data_storage[key].append(data_chunk.encode('utf-8') if isinstance(data_chunk, str) else data_chunk)
+            # Store the chunk, ensuring it's in bytes
+            if not self.store_chunk(key, chunk_index, data_chunk.encode('utf-8') if isinstance(data_chunk, str) else data_chunk):
+                if chunk_index == total_chunks:
+                    self.reject_transfer(key)
+                return
 
             # If this is the last chunk, combine all chunks and store the complete data
             if chunk_index == total_chunks:
-                message["info"]["file"]["data"] = b''.join(self.chunk_data_storage[key])
-                del self.chunk_data_storage[key]  # Clean up the storage
+                message["info"]["file"]["data"] = b''.join(self.chunk_data_storage.pop(key))
+                del self.chunk_since[key]  # Clean up the storage
 
         # Resolve the pending future with the final message
-        if key in self.pending_callbacks:
-            for future in self.pending_callbacks[key]:
-                if future:
-                    future.set_result(message)  # Resolve the future with the message
-            del self.pending_callbacks[key]
+        self.resolve(key, message)
 
     def generate_message_key(self, message_type, topic, identifier):
         return identifier or f"{message_type} $ {topic}"
@@ -3,6 +3,8 @@ import logging
 import time
 from ..constants import DATA_CHANNEL_TYPE
 
+logger = logging.getLogger(__name__)
+
 class WebRTCDataChannelHeartBeat:
     def __init__(self, channel, pub_sub):
         self.channel = channel
@@ -43,5 +45,5 @@ class WebRTCDataChannelHeartBeat:
     def handle_response(self, message):
         """Handle a received heartbeat message."""
         self.heartbeat_response = time.time()
-        logging.info("Heartbeat response received.")
+        logger.info("Heartbeat response received.")
     
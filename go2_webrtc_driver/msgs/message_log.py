@@ -0,0 +1,83 @@
+import logging
+
+# Data channel traffic is logged at DEBUG on one child logger per topic, e.g.
+# "go2_webrtc_driver.messages.rt.lowstate", so the usual logging configuration
+# turns topics on and off:
+#
+#   logging.getLogger("go2_webrtc_driver.messages").setLevel(logging.DEBUG)
+#   message_log.set_topic_level("rt/utlidar/voxel_map_compressed", logging.WARNING)
+#   message_log.set_sample_rate("rt/lowstate", 50)  # 1 in 50 messages
+LOGGER_NAME = "go2_webrtc_driver.messages"
+
+# Payloads are cut to this many characters in the log
+MAX_PAYLOAD_LENGTH = 200
+
+
+class _Payload:
+    """Formats a payload only when a handler actually emits the record."""
+
+    __slots__ = ("payload", "max_length")
+
+    def __init__(self, payload, max_length):
+        self.payload = payload
+        self.max_length = max_length
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            return f"<{len(payload)} bytes: {bytes(payload[:32]).hex()}{'...' if len(payload) > 32 else ''}>"
+        text = payload if isinstance(payload, str) else repr(payload)
+        if self.max_length is not None and len(text) > self.max_length:
+            return f"{text[:self.max_length]}... ({len(text)} chars)"
+        return text
+
+
+class MessageLog:
+    def __init__(self, max_payload_length=MAX_PAYLOAD_LENGTH):
+        self.max_payload_length = max_payload_length
+        self._loggers = {}  # topic -> logger
+        self._sample_rates = {}  # topic -> log 1 in N messages, None is the default for all topics
+        self._counters = {}  # topic -> messages seen since the last logged one
+
+    def get_logger(self, topic):
+        logger = self._loggers.get(topic)
+        if logger is None:
+            # Topics look like "rt/lowstate", logger names use dots
+            suffix = ".".join(part for part in (topic or "").split("/") if part)
+            logger = logging.getLogger(f"{LOGGER_NAME}.{suffix}" if suffix else LOGGER_NAME)
+            self._loggers[topic] = logger
+        return logger
+
+    def set_topic_level(self, topic, level):
+        """Set the log level of one topic, logging.DEBUG shows its messages."""
+        self.get_logger(topic).setLevel(level)
+
+    def set_sample_rate(self, topic, every_n):
+        """Log only 1 in every_n messages of topic, or of all topics when topic is None."""
+        if every_n < 1:
+            raise ValueError("every_n must be at least 1")
+        self._sample_rates[topic] = every_n
+        self._counters.pop(topic, None)
+
+    def received(self, topic, payload):
+        self._log(topic, "< message received on %s: %s", payload)
+
+    def sent(self, topic, payload):
+        self._log(topic, "> message sent on %s: %s", payload)
+
+    def _log(self, topic, msg, payload):
+        logger = self.get_logger(topic)
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        every_n = self._sample_rates.get(topic) or self._sample_rates.get(None)
+        if every_n and every_n > 1:
+            count = self._counters.get(topic, 0)
+            self._counters[topic] = (count + 1) % every_n
+            if count:
+                return
+
+        logger.debug(msg, topic, _Payload(payload, self.max_payload_length))
+
+
+message_log = MessageLog()
@@ -0,0 +1,160 @@
+"""
+Fixed rate Move commands.
+
+A joystick or UI produces velocity targets much faster, and much less
+regularly, than the robot needs them. MotionScheduler keeps only the latest
+target and sends it as a SPORT_CMD["Move"] request at rate_hz, without
+waiting for the acknowledgement:
+
+    motion = conn.datachannel.motion
+    motion.set_target(0.5, 0, 0.2)   # any number of times per second
+    motion.set_target(0, 0, 0)       # sent once more, then the scheduler idles
+
+A non-zero target is repeated every period until it changes, for at most
+target_ttl seconds. A caller that stops sending targets without a zero one,
+a frozen UI or a lost key-up, gets the robot stopped after that. Jitter is
+how late each send was against its schedule. A tick that finds the data
+channel closed sends nothing and the scheduler idles until the next target.
+"""
+import asyncio
+import logging
+
+from ..constants import DATA_CHANNEL_TYPE, RTC_TOPIC, SPORT_CMD
+from ..receive_pipeline import LatencyHistogram
+from .message_template import Field, JsonTemplate, MessageTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class MotionScheduler:
+    def __init__(self, pub_sub, rate_hz=20, topic=RTC_TOPIC["SPORT_MOD"], target_ttl=0.5):
+        """target_ttl is how long a target is repeated without a new one, None repeats it until it changes."""
+        self.pub_sub = pub_sub
+        self.target_ttl = target_ttl
+        self.topic = topic
+        self.template = MessageTemplate(DATA_CHANNEL_TYPE["REQUEST"], topic, {
+            "header": {"identity": {"id": Field("id"), "api_id": SPORT_CMD["Move"]}},
+            "parameter": JsonTemplate({"x": Field("x"), "y": Field("y"), "z": Field("z")}),
+        })
+        self.set_rate(rate_hz)
+
+        self.target = None  # latest (x, y, z) not sent yet, None when nothing new
+        self.current = (0.0, 0.0, 0.0)  # last target sent
+        self.target_at = None  # loop time of the latest set_target
+        self.timer = None
+        self.deadline = None  # loop time the next send is scheduled for
+        self.run_started = None
+        self.run_sent = 0
+
+        self.targets = 0  # set_target calls
+        self.coalesced = 0  # targets replaced by a newer one before being sent
+        self.sent = 0
+        self.missed = 0  # periods skipped because the loop was too busy
+        self.timed_out = 0  # targets stopped after target_ttl without a new one
+        self.jitter = LatencyHistogram()
+        self.max_jitter = 0.0
+
+    def set_rate(self, rate_hz):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+
+    def set_target(self, x, y, z):
+        """Velocity target, sent at the next tick. Returns at once."""
+        self.targets += 1
+        if self.target is not None:
+            self.coalesced += 1
+        self.target = (float(x), float(y), float(z))
+        loop = asyncio.get_event_loop()
+        self.target_at = loop.time()
+
+        if self.timer is None:
+            # Idle, send right away and keep the rate from here
+            self.deadline = self.run_started = self.target_at
+            self.run_sent = 0
+            self.tick()
+
+    def stop(self):
+        """Send a zero target and stop repeating."""
+        self.set_target(0, 0, 0)
+
+    def cancel(self):
+        """Stop sending without a final zero target, used when the channel closes."""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.target = None
+
+    def tick(self):
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        late = max(0.0, now - self.deadline)
+        self.jitter.record(late)
+        if late > self.max_jitter:
+            self.max_jitter = late
+
+        if self.target is not None:
+            self.current = self.target
+            self.target = None
+        elif self.target_ttl is not None and self.current != (0.0, 0.0, 0.0) and now - self.target_at > self.target_ttl:
+            # The caller went quiet without stopping, stop for it
+            self.current = (0.0, 0.0, 0.0)
+            self.timed_out += 1
+            logger.warning("No Move target for %s s, stopping", self.target_ttl)
+        if not self.send(self.current):
+            # Channel not open, idle until the next target
+            logger.debug("Data channel is not open, Move scheduler stopped")
+            self.timer = None
+            self.target = None
+            return
+
+        if self.current == (0.0, 0.0, 0.0) and self.target is None:
+            # Stopped, nothing to repeat until the next target
+            self.timer = None
+            return
+
+        self.deadline += self.period
+        if self.deadline <= now:
+            skipped = int((now - self.deadline) // self.period) + 1
+            self.missed += skipped
+            self.deadline += skipped * self.period
+        self.timer = loop.call_at(self.deadline, self.tick)
+
+    def send(self, target):
+        """Send target, returns False when the channel is not open."""
+        x, y, z = target
+        try:
+            # No future is saved, the acknowledgement is not waited for
+            sent = self.pub_sub.publish_template(
+                self.template,
+                id=self.pub_sub.request_ids.next_id(),
+                x=x, y=y, z=z,
+            )
+        except Exception:
+            # Retried at the next tick
+            logger.error("Failed to send Move command", exc_info=True)
+            return True
+        if sent:
+            self.sent += 1
+            self.run_sent += 1
+        return sent
+
+    def stats(self):
+        loop = asyncio.get_event_loop()
+        running = self.timer is not None
+        elapsed = loop.time() - self.run_started if running and self.run_started is not None else 0.0
+        return {
+            "rate_hz": self.rate_hz,
+            "running": running,
+            "targets": self.targets,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "missed": self.missed,
+            "timed_out": self.timed_out,
+            # The first send of a run is at its start
+            "send_rate_hz": (self.run_sent - 1) / elapsed if elapsed > 0 and self.run_sent > 1 else 0.0,
+            "jitter_p50_us": self.jitter.percentile(0.5),
+            "jitter_p99_us": self.jitter.percentile(0.99),
+            "max_jitter_us": self.max_jitter * 1e6,
+        }
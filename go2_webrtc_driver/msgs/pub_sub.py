@@ -1,32 +1,176 @@
 import asyncio
-import json
-import time
-import random
 import logging
+from collections import namedtuple
+from time import monotonic
 from ..constants import DATA_CHANNEL_TYPE
-from .future_resolver import FutureResolver
+from .future_resolver import FutureResolver, RequestIdAllocator
+from .message_log import message_log
+from .subscriptions import CallbackSubscription, AsyncCallbackSubscription, CallbackWorker, TopicStream, RateLimit
 from ..util import get_nested_field
+from .. import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Newest message of a topic, timestamp is time.monotonic() on arrival and seq
+# counts the messages of the topic from 1
+LatestMessage = namedtuple("LatestMessage", ("message", "timestamp", "seq"))
+
 
 class WebRTCDataChannelPubSub:
 
-    def __init__(self, channel):
+    def __init__(self, channel, max_callbacks_in_flight=16):
+        """max_callbacks_in_flight is how many async callbacks run at once, over all topics."""
+        if max_callbacks_in_flight < 1:
+            raise ValueError("max_callbacks_in_flight must be at least 1")
         self.channel = channel
 
         self.future_resolver = FutureResolver()
-        self.subscriptions = {}  # Dictionary to hold callbacks keyed by topic
+        self.request_ids = RequestIdAllocator(self.future_resolver.is_pending)
+        self.subscriptions = {}  # topic -> tuple of subscribers, replaced rather than mutated
+        self.routes = {}  # (type, topic) -> subscribers, messages that only feed subscriptions
+        self.dispatch_counts = {"subscription": 0, "resolver": 0, "decode_errors": 0}
+        self.lidar_filters = {}  # topic -> LidarFilter its frames are decoded with, see update_lidar_decode
+        self.rate_limits = {}  # topic -> RateLimits of its subscribers, only while all of them have one
+        self.callback_workers = {}  # topic -> CallbackWorker running its async callbacks
+        self.max_callbacks_in_flight = max_callbacks_in_flight
+        self.callback_slots = None  # Semaphore of max_callbacks_in_flight, made on first use
+        self.latest = {}  # topic -> (message, timestamp, seq)
+        self.latest_waiters = {}  # topic -> futures of wait_newer calls
     
-    def run_resolve(self, message):
-        self.future_resolver.run_resolve_for_topic(message)
+    def admit(self, message):
+        """
+        Whether a received message is worth decoding. Called by the data
+        channel before the message or its binary body is decoded, it is
+        skipped when every subscriber of the topic is rate limited and none
+        of them would take it.
+        """
+        topic = message.get("topic")
+        rate_limits = self.rate_limits.get(topic)
+        if rate_limits is None or message.get("type") != DATA_CHANNEL_TYPE["MSG"] or topic in self.future_resolver.pending_topics:
+            return True
+        now = monotonic()
+        for rate_limit in rate_limits:
+            if rate_limit.peek(now):
+                return True
+        # Counted as decimated by every subscriber
+        for rate_limit in rate_limits:
+            rate_limit.accept(now)
+        return False
+
+    def get_pending_stats(self):
+        """Count and age of the requests waiting for a response, see FutureResolver."""
+        return self.future_resolver.get_pending_stats()
 
-         # Extract the topic from the message
+    def get_rate_limit_stats(self):
+        """Accepted and decimated message counts of the rate limited subscribers, per topic."""
+        stats = {}
+        for topic, subscribers in self.subscriptions.items():
+            for subscriber in subscribers:
+                if subscriber.rate_limit is not None:
+                    stats.setdefault(topic, []).append(subscriber.rate_limit.stats())
+        return stats
+
+    def run_resolve(self, message):
         topic = message.get("topic")
-        if topic in self.subscriptions:
-            # Call the registered callback with the message
-            callback = self.subscriptions[topic]
-            callback(message)
-        
+        message_type = message.get("type")
+        is_topic_data = message_type == DATA_CHANNEL_TYPE["MSG"]
+        now = monotonic()
+        if is_topic_data and topic:
+            # Plain tuple, made a LatestMessage when read as this runs for
+            # every received message
+            previous = self.latest.get(topic)
+            self.latest[topic] = (message, now, previous[2] + 1 if previous else 1)
+            if topic in self.latest_waiters:
+                self.wake_latest_waiters(topic)
+
+        subscribers = self.routes.get((message_type, topic))
+
+        # Subscription traffic skips the resolver unless a request waits on the
+        # topic or the message is chunked
+        data = message.get("data")
+        if subscribers is None or topic in self.future_resolver.pending_topics or (isinstance(data, dict) and "content_info" in data):
+            self.dispatch_counts["resolver"] += 1
+            self.future_resolver.run_resolve_for_topic(message)
+            subscribers = self.subscriptions.get(topic)
+            if subscribers is None:
+                return
+        else:
+            self.dispatch_counts["subscription"] += 1
 
-    async def publish(self, topic, data=None, msg_type=None):
+        # Typed subscribers get a copy of the message with the decoded record,
+        # decoded once however many of them there are. A message that doesn't
+        # decode is only skipped for them, False marks the failed decode
+        typed_message = None
+        for subscriber in subscribers:
+            rate_limit = subscriber.rate_limit
+            if rate_limit is not None and is_topic_data and not rate_limit.accept(now):
+                continue
+            if subscriber.lidar_filter is not None and isinstance(data, dict) and isinstance(data.get("data"), dict):
+                # Frame decoded to points once, each subscriber filters its own copy
+                subscriber.deliver(dict(message, data=dict(data, data=subscriber.lidar_filter.apply(data["data"]))))
+            elif subscriber.state_decoder is not None and isinstance(data, dict):
+                if typed_message is None:
+                    try:
+                        typed_message = dict(message, data=subscriber.state_decoder.decode(data))
+                    except Exception:
+                        typed_message = False
+                        self.dispatch_counts["decode_errors"] += 1
+                        logger.error("Failed to decode typed message on %s", topic, exc_info=True)
+                if typed_message is not False:
+                    subscriber.deliver(typed_message)
+            else:
+                subscriber.deliver(message)
+
+    def wake_latest_waiters(self, topic):
+        latest = LatestMessage._make(self.latest[topic])
+        for future in self.latest_waiters.pop(topic):
+            if not future.done():
+                future.set_result(latest)
+
+    def get_latest(self, topic):
+        """
+        The newest message received on topic as a LatestMessage(message,
+        timestamp, seq), None before the first one. Only the newest message is
+        kept, so reading it costs nothing per received message.
+        """
+        latest = self.latest.get(topic)
+        return LatestMessage._make(latest) if latest else None
+
+    async def wait_newer(self, topic, seq=0, timeout=None):
+        """
+        Wait for a message on topic newer than seq and return its
+        LatestMessage. Returns at once when one already arrived, messages in
+        between are skipped. Raises asyncio.TimeoutError after timeout seconds.
+
+            latest = None
+            while True:
+                latest = await pub_sub.wait_newer(topic, latest.seq if latest else 0)
+        """
+        latest = self.get_latest(topic)
+        if latest is not None and latest.seq > seq:
+            return latest
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.latest_waiters.setdefault(topic, [])
+        waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # Timed out or cancelled, a resolved future was already popped
+            waiters = self.latest_waiters.get(topic)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self.latest_waiters[topic]
+
+
+    async def publish(self, topic, data=None, msg_type=None, timeout=None):
+        """
+        Send a message and wait for its response. With timeout the wait
+        raises asyncio.TimeoutError after that many seconds, without it the
+        FutureResolver ttl applies. Cancelling or timing out forgets the
+        request.
+        """
         channel = self.channel
         future = asyncio.get_event_loop().create_future()
 
@@ -40,12 +184,12 @@ class WebRTCDataChannelPubSub:
                 message_dict["data"] = data
             
             # Convert the dictionary to a JSON string
-            message = json.dumps(message_dict)
+            message = json_codec.dumps(message_dict)
 
             channel.send(message)
 
             # Log the message being published
-            logging.info(f"> message sent: {message}")
+            message_log.sent(topic, message)
 
             # Store the future so it can be completed when the response is received
             uuid = (
@@ -58,6 +202,8 @@ class WebRTCDataChannelPubSub:
         else:
             future.set_exception(Exception("Data channel is not open"))
 
+        if timeout is not None:
+            return await asyncio.wait_for(future, timeout)
         return await future
     
 
@@ -74,20 +220,30 @@ class WebRTCDataChannelPubSub:
                 message_dict["data"] = data
             
             # Convert the dictionary to a JSON string
-            message = json.dumps(message_dict)
+            message = json_codec.dumps(message_dict)
                 
             self.channel.send(message)
 
             # Log the message being published
-            logging.info(f"> message sent: {message}")
+            message_log.sent(topic, message)
         else:
             Exception("Data channel is not open")
-        
 
-    async def publish_request_new(self, topic, options=None):
-        # Generate a unique identifier
-        generated_id = int(time.time() * 1000) % 2147483648 + random.randint(0, 1000)
-        
+    def publish_template(self, template, **values):
+        """
+        Send a MessageTemplate filled in with values, see msgs/message_template.py.
+        Like publish_without_callback nothing waits for a response. Returns
+        False, without sending, when the channel is not open.
+        """
+        if self.channel.readyState != "open":
+            return False
+        topic = template.topic if template.topic is not None else values["topic"]
+        message = template.fill(values)
+        self.channel.send(message)
+        message_log.sent(topic, message)
+        return True
+
+    async def publish_request_new(self, topic, options=None, timeout=None):
         # Check if api_id is provided
         if not (options and "api_id" in options):
             print("Error: Please provide app id")
@@ -97,7 +253,7 @@ class WebRTCDataChannelPubSub:
         request_payload = {
             "header": {
                 "identity": {
-                    "id": options.get("id", generated_id),
+                    "id": options["id"] if "id" in options else self.request_ids.next_id(),
                     "api_id": options.get("api_id", 0)
                 }
             },
@@ -106,7 +262,7 @@ class WebRTCDataChannelPubSub:
 
         # Add data to parameter
         if options and "data" in options:
-            request_payload["parameter"] = options["data"] if isinstance(options["data"], str) else json.dumps(options["data"])
+            request_payload["parameter"] = options["data"] if isinstance(options["data"], str) else json_codec.dumps(options["data"])
 
         # if options and "parameter" in options:
         #     request_payload["parameter"] = options["parameter"] if isinstance(options["parameter"], str) else json.dumps(options["parameter"])
@@ -118,22 +274,171 @@ class WebRTCDataChannelPubSub:
             }
 
         # Publish the request
-        return await self.publish(topic, request_payload, DATA_CHANNEL_TYPE["REQUEST"])
+        return await self.publish(topic, request_payload, DATA_CHANNEL_TYPE["REQUEST"], timeout)
     
-    def subscribe(self, topic, callback=None):
+    def subscribe(self, topic, callback=None, lidar_filter=None, typed=False, max_hz=None, every_nth=None, callback_queue_size=100):
+        """
+        Subscribe to topic. Every callback subscribed to a topic is called,
+        subscribing again adds a subscriber instead of replacing the first.
+
+        For lidar topics lidar_filter, a LidarFilter, makes this callback
+        receive cropped and downsampled world points instead of the full voxel
+        mesh. Frames are decoded to points once and each subscriber's filter
+        is applied to them, so the subscribers of a topic either all have a
+        filter or none has, mixing the two raises ValueError.
+
+        callback may be a coroutine function. Async callbacks of a topic are
+        awaited one after the other, in message order, while different topics
+        run concurrently with at most max_callbacks_in_flight callbacks
+        running at once, see __init__. A topic whose callbacks fall more than
+        callback_queue_size messages behind drops the oldest ones. Its async
+        subscribers share one queue, which gets the largest size any of them
+        asked for.
+
+        With typed=True lowstate and sportmodestate messages carry a NumPy
+        structured record as message["data"], see msgs/state_types.py.
+
+        max_hz and every_nth decimate the messages this callback gets, other
+        subscribers of the topic are not affected. Only when every subscriber
+        of the topic is rate limited are the messages none of them takes
+        dropped as they are received, before their JSON body is handed on or
+        a lidar frame is decoded, and get_latest doesn't see those. The
+        counts are reported by get_rate_limit_stats.
+        """
         channel = self.channel
 
         if not channel or channel.readyState != "open":
             print("Error: Data channel is not open")
             return
-        
+
+        state_decoder = self.state_decoder_for(topic, typed)
+        rate_limit = RateLimit(max_hz, every_nth) if max_hz is not None or every_nth is not None else None
+        if callback_queue_size < 1:
+            raise ValueError("callback_queue_size must be at least 1")
+        # Before the callback worker is made, a rejected subscribe leaves nothing behind
+        self.check_lidar_filter(topic, lidar_filter if callback else None)
+
         # Register the callback for the topic
-        if callback:
-            self.subscriptions[topic] = callback
+        if asyncio.iscoroutinefunction(callback):
+            worker = self.callback_worker(topic, callback_queue_size)
+            self.add_subscriber(AsyncCallbackSubscription(topic, callback, worker, state_decoder, lidar_filter, rate_limit))
+        elif callback:
+            self.add_subscriber(CallbackSubscription(topic, callback, state_decoder, lidar_filter, rate_limit))
 
         self.publish_without_callback(topic=topic, msg_type=DATA_CHANNEL_TYPE["SUBSCRIBE"])
 
+    def stream(self, topic, maxsize=100, policy="drop_oldest", typed=False, block_limit=None):
+        """
+        Subscribe to topic and return a TopicStream, an async iterator over
+        its messages with its own queue of maxsize messages. policy is what a
+        full queue does with a new message, see msgs/subscriptions.py,
+        block_limit caps the queue of the "block" policy.
+        Closing the stream removes it, the last subscriber of a topic leaving
+        unsubscribes from it.
+        """
+        channel = self.channel
+
+        if not channel or channel.readyState != "open":
+            raise Exception("Data channel is not open")
+
+        stream = TopicStream(topic, maxsize, policy, self.state_decoder_for(topic, typed), self.remove_subscriber, block_limit)
+        self.add_subscriber(stream)
+        self.publish_without_callback(topic=topic, msg_type=DATA_CHANNEL_TYPE["SUBSCRIBE"])
+        return stream
+
+    def state_decoder_for(self, topic, typed):
+        if not typed:
+            return None
+        # Imported here, numpy is only needed for typed subscriptions
+        from .state_types import STATE_DECODERS
+        state_decoder = STATE_DECODERS.get(topic)
+        if state_decoder is None:
+            raise ValueError(f"No typed decoder for topic {topic}")
+        return state_decoder
+
+    def callback_worker(self, topic, maxsize):
+        worker = self.callback_workers.get(topic)
+        if worker is None:
+            worker = self.callback_workers[topic] = CallbackWorker(topic, self.get_callback_slots, maxsize)
+        elif maxsize > worker.maxsize:
+            worker.maxsize = maxsize
+        return worker
+
+    def get_callback_slots(self):
+        # Made here rather than in __init__ so it belongs to the running loop
+        if self.callback_slots is None:
+            self.callback_slots = asyncio.Semaphore(self.max_callbacks_in_flight)
+        return self.callback_slots
+
+    def check_lidar_filter(self, topic, lidar_filter):
+        """Raise ValueError if a subscriber with lidar_filter can't join the subscribers of topic."""
+        if self.subscriptions.get(topic) and (lidar_filter is None) != (topic not in self.lidar_filters):
+            raise ValueError(f"Subscribers of {topic} must all have a lidar_filter or none")
+
+    def add_subscriber(self, subscriber):
+        topic = subscriber.topic
+        self.check_lidar_filter(topic, subscriber.lidar_filter)
+        subscribers = self.subscriptions.get(topic, ()) + (subscriber,)
+        self.subscriptions[topic] = subscribers
+        self.routes[(DATA_CHANNEL_TYPE["MSG"], topic)] = subscribers
+        self.update_lidar_decode(topic)
+        self.update_rate_limits(topic)
+
+    def remove_subscriber(self, subscriber):
+        topic = subscriber.topic
+        subscribers = tuple(s for s in self.subscriptions.get(topic, ()) if s is not subscriber)
+        if subscribers:
+            self.subscriptions[topic] = subscribers
+            self.routes[(DATA_CHANNEL_TYPE["MSG"], topic)] = subscribers
+            self.update_lidar_decode(topic)
+            self.update_rate_limits(topic)
+        elif topic in self.subscriptions:
+            self.unsubscribe(topic)
+
+    def update_lidar_decode(self, topic):
+        """
+        Frames of a topic with filtered subscribers are decoded to points by
+        an unfiltered LidarFilter, with intensity when any filter keeps it.
+        """
+        # Imported here, numpy is only needed for lidar filters
+        from ..lidar.point_filter import LidarFilter
+        filters = [s.lidar_filter for s in self.subscriptions.get(topic, ()) if s.lidar_filter is not None]
+        if filters:
+            self.lidar_filters[topic] = LidarFilter(with_intensity=any(f.with_intensity for f in filters))
+        else:
+            self.lidar_filters.pop(topic, None)
+
+    def update_rate_limits(self, topic):
+        """Let admit skip messages of topic while all of its subscribers are rate limited."""
+        rate_limits = tuple(s.rate_limit for s in self.subscriptions.get(topic, ()))
+        if rate_limits and None not in rate_limits:
+            self.rate_limits[topic] = rate_limits
+        else:
+            self.rate_limits.pop(topic, None)
+
+    def get_subscriber_stats(self, topic=None):
+        """Counters of every subscriber, or of the subscribers of topic."""
+        topics = [topic] if topic is not None else list(self.subscriptions)
+        return [subscriber.stats() for t in topics for subscriber in self.subscriptions.get(t, ())]
+
     def unsubscribe(self, topic):
+        """
+        Unsubscribe from topic, its callbacks are removed and its streams
+        closed. Its latest message is dropped too, get_latest returns None
+        until the topic is received again.
+        """
+        subscribers = self.subscriptions.pop(topic, ())
+        self.latest.pop(topic, None)
+        self.routes.pop((DATA_CHANNEL_TYPE["MSG"], topic), None)
+        self.lidar_filters.pop(topic, None)
+        self.rate_limits.pop(topic, None)
+        worker = self.callback_workers.pop(topic, None)
+        if worker:
+            worker.cancel()
+        for subscriber in subscribers:
+            if isinstance(subscriber, TopicStream):
+                subscriber.close()
+
         channel = self.channel
 
         if not channel or channel.readyState != "open":
@@ -0,0 +1,85 @@
+"""
+Pipelined API requests.
+
+publish_request_new sends one request and waits for its response, so a
+caller doing several requests pays a full round trip for each. RequestClient
+keeps up to window requests of a topic in flight, responses are matched to
+requests by header.identity.id like before:
+
+    client = RequestClient(conn.datachannel.pub_sub, window=4)
+    futures = [await client.submit(RTC_TOPIC["SPORT_MOD"], {"api_id": api_id}) for api_id in api_ids]
+    responses = await asyncio.gather(*futures)
+
+submit waits while the window of the topic is full, so a fast producer is
+slowed down to the rate the robot answers at. Requests are sent in the order
+they were submitted.
+"""
+import asyncio
+
+
+class RequestClient:
+    def __init__(self, pub_sub, window=4, timeout=None):
+        """window is the number of requests in flight per topic, timeout the default per request."""
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.pub_sub = pub_sub
+        self.window = window
+        self.timeout = timeout
+        self.slots = {}  # topic -> Semaphore of window
+        self.in_flight_ids = set()
+
+        self.sent = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_in_flight = 0
+
+    async def submit(self, topic, options, timeout=None):
+        """
+        Send a request once the window of topic has room and return a future
+        of its response. options are those of publish_request_new.
+        """
+        slots = self.slots.get(topic)
+        if slots is None:
+            slots = self.slots[topic] = asyncio.Semaphore(self.window)
+        await slots.acquire()
+
+        options = dict(options)
+        if "id" not in options:
+            options["id"] = self.pub_sub.request_ids.next_id()
+        request_id = options["id"]
+        self.in_flight_ids.add(request_id)
+        self.sent += 1
+        in_flight = len(self.in_flight_ids)
+        if in_flight > self.max_in_flight:
+            self.max_in_flight = in_flight
+
+        future = asyncio.ensure_future(self.pub_sub.publish_request_new(topic, options, timeout if timeout is not None else self.timeout))
+        future.add_done_callback(lambda f: self.on_done(f, slots, request_id))
+        return future
+
+    def on_done(self, future, slots, request_id):
+        self.in_flight_ids.discard(request_id)
+        slots.release()
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def request(self, topic, options, timeout=None):
+        """Send a request and wait for its response, within the window of topic."""
+        return await (await self.submit(topic, options, timeout))
+
+    async def request_many(self, topic, options_list, timeout=None):
+        """Send every request of options_list pipelined, returns the responses in the same order."""
+        futures = [await self.submit(topic, options, timeout) for options in options_list]
+        return await asyncio.gather(*futures)
+
+    def stats(self):
+        return {
+            "window": self.window,
+            "in_flight": len(self.in_flight_ids),
+            "max_in_flight": self.max_in_flight,
+            "sent": self.sent,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
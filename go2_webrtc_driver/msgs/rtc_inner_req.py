@@ -4,6 +4,8 @@ import base64
 from ..constants import DATA_CHANNEL_TYPE, WebRTCConnectionMethod
 from ..util import generate_uuid
 
+logger = logging.getLogger(__name__)
+
 class WebRTCChannelProbeResponse:
     def __init__(self, channel, pub_sub):
         self.channel = channel
@@ -58,11 +60,11 @@ class WebRTCDataChannelNetworkStatus:
             )
             self.handle_response(response.get("info"))
         except Exception as e:
-            logging.error("Failed to publish:", e)
+            logger.error("Failed to publish: %s", e)
         
     def handle_response(self, info):
         """Handle a received network status message."""
-        logging.info("Network status message received.")
+        logger.info("Network status message received.")
         status = info.get("status")
         if status == "Undefined" or status == "NetworkStatus.DISCONNECTED":
             # Schedule the next network status request in 0.5s
@@ -172,14 +174,14 @@ class WebRTCDataChannelFileDownloader:
 
             # Check if the download was canceled
             if self.cancel_download:
-                logging.info("Download canceled.")
+                logger.info("Download canceled.")
                 return "cancel"
             
             # Extract the complete data after all chunks have been combined in the resolver
             complete_data = response.get("info", {}).get("file", {}).get("data")
 
             if not complete_data:
-                logging.error("Failed to get the file data.")
+                logger.error("Failed to get the file data.")
                 return "error"
             
             # Decode the Base64-encoded data
@@ -192,7 +194,7 @@ class WebRTCDataChannelFileDownloader:
             return decoded_data
 
         except Exception as e:
-            logging.error("Failed to download file:", e)
+            logger.error("Failed to download file: %s", e)
             return "error"
 
 def cancel(self):
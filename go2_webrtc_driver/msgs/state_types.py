@@ -0,0 +1,134 @@
+"""
+Typed decoders for the high-rate state topics.
+
+A StateDecoder turns the "data" dict of a lowstate or sportmodestate message
+into a NumPy structured record, so per-motor values such as motor_q come out
+as one contiguous array instead of a list of dicts:
+
+    state = LOWSTATE.decode(message["data"])
+    state["motor_q"]            # float32[20]
+
+StateBuffer keeps the last N records in one structured array for vectorized
+analytics over time. Subscribing with typed=True delivers the record as
+message["data"], see WebRTCDataChannelPubSub.subscribe.
+"""
+import numpy as np
+
+from ..constants import RTC_TOPIC
+
+MOTOR_COUNT = 20
+
+
+def _motor_field(key):
+    def get(data):
+        motors = data.get("motor_state", ())
+        values = [motor.get(key, 0) for motor in motors[:MOTOR_COUNT]]
+        if len(values) < MOTOR_COUNT:
+            values += [0] * (MOTOR_COUNT - len(values))
+        return values
+    return get
+
+
+def _field(*path, default=0):
+    def get(data):
+        for key in path:
+            data = data.get(key)
+            if data is None:
+                return default
+        return data
+    return get
+
+
+class StateDecoder:
+    def __init__(self, fields):
+        """fields is a sequence of (name, dtype, shape, getter), getter(data) returns the value."""
+        self.dtype = np.dtype([(name, dtype, shape) if shape else (name, dtype) for name, dtype, shape, _ in fields])
+        self.getters = tuple(getter for _, _, _, getter in fields)
+
+    def values(self, data):
+        """Field values of a message as a tuple, in dtype order."""
+        return tuple([get(data) for get in self.getters])
+
+    def decode(self, data):
+        """Decode the "data" dict of a message into a 0-d structured array."""
+        return np.array(self.values(data), dtype=self.dtype)
+
+    def buffer(self, capacity):
+        return StateBuffer(self, capacity)
+
+
+class StateBuffer:
+    def __init__(self, decoder, capacity):
+        """Ring buffer of the last capacity records decoded by decoder."""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.decoder = decoder
+        self.records = np.zeros(capacity, dtype=decoder.dtype)
+        self.count = 0  # messages appended so far
+
+    def append(self, data):
+        """Decode a message straight into the next row, no per message array."""
+        self.records[self.count % len(self.records)] = self.decoder.values(data)
+        self.count += 1
+
+    def latest(self):
+        if not self.count:
+            return None
+        return self.records[(self.count - 1) % len(self.records)]
+
+    def array(self):
+        """The buffered records, oldest first."""
+        capacity = len(self.records)
+        if self.count <= capacity:
+            return self.records[:self.count]
+        start = self.count % capacity
+        return np.concatenate((self.records[start:], self.records[:start]))
+
+    def __len__(self):
+        return min(self.count, len(self.records))
+
+
+LOWSTATE = StateDecoder((
+    ("rpy", np.float32, 3, _field("imu_state", "rpy", default=(0, 0, 0))),
+    ("motor_q", np.float32, MOTOR_COUNT, _motor_field("q")),
+    ("motor_dq", np.float32, MOTOR_COUNT, _motor_field("dq")),
+    ("motor_tau", np.float32, MOTOR_COUNT, _motor_field("tau_est")),
+    ("motor_temperature", np.int16, MOTOR_COUNT, _motor_field("temperature")),
+    ("motor_lost", np.uint32, MOTOR_COUNT, _motor_field("lost")),
+    ("foot_force", np.int16, 4, _field("foot_force", default=(0, 0, 0, 0))),
+    ("temperature_ntc1", np.int16, None, _field("temperature_ntc1")),
+    ("power_v", np.float32, None, _field("power_v")),
+    ("bms_soc", np.uint8, None, _field("bms_state", "soc")),
+    ("bms_current", np.int32, None, _field("bms_state", "current")),
+    ("bms_cycle", np.uint16, None, _field("bms_state", "cycle")),
+))
+
+SPORTMODESTATE = StateDecoder((
+    ("stamp_sec", np.int64, None, _field("stamp", "sec")),
+    ("stamp_nanosec", np.uint32, None, _field("stamp", "nanosec")),
+    ("error_code", np.int32, None, _field("error_code")),
+    ("quaternion", np.float32, 4, _field("imu_state", "quaternion", default=(0, 0, 0, 0))),
+    ("gyroscope", np.float32, 3, _field("imu_state", "gyroscope", default=(0, 0, 0))),
+    ("accelerometer", np.float32, 3, _field("imu_state", "accelerometer", default=(0, 0, 0))),
+    ("rpy", np.float32, 3, _field("imu_state", "rpy", default=(0, 0, 0))),
+    ("imu_temperature", np.int16, None, _field("imu_state", "temperature")),
+    ("mode", np.uint8, None, _field("mode")),
+    ("progress", np.float32, None, _field("progress")),
+    ("gait_type", np.uint8, None, _field("gait_type")),
+    ("foot_raise_height", np.float32, None, _field("foot_raise_height")),
+    ("position", np.float32, 3, _field("position", default=(0, 0, 0))),
+    ("body_height", np.float32, None, _field("body_height")),
+    ("velocity", np.float32, 3, _field("velocity", default=(0, 0, 0))),
+    ("yaw_speed", np.float32, None, _field("yaw_speed")),
+    ("range_obstacle", np.float32, 4, _field("range_obstacle", default=(0, 0, 0, 0))),
+    ("foot_force", np.int16, 4, _field("foot_force", default=(0, 0, 0, 0))),
+    ("foot_position_body", np.float32, 12, _field("foot_position_body", default=(0,) * 12)),
+    ("foot_speed_body", np.float32, 12, _field("foot_speed_body", default=(0,) * 12)),
+))
+
+# Decoders used by subscribe(..., typed=True)
+STATE_DECODERS = {
+    RTC_TOPIC["LOW_STATE"]: LOWSTATE,
+    RTC_TOPIC["SPORT_MOD_STATE"]: SPORTMODESTATE,
+    RTC_TOPIC["LF_SPORT_MOD_STATE"]: SPORTMODESTATE,
+}
@@ -0,0 +1,295 @@
+"""
+Subscribers of a data channel topic.
+
+A topic can have any number of subscribers, each gets every message of the
+topic independently of the others. CallbackSubscription calls a function on
+the receive path, AsyncCallbackSubscription awaits a coroutine function on the
+CallbackWorker of the topic and TopicStream queues the messages for an async
+consumer:
+
+    stream = pub_sub.stream(RTC_TOPIC["LOW_STATE"], maxsize=10)
+    async for message in stream:
+        ...
+    stream.close()
+
+A stream never holds up the receive path, when its queue is full the overflow
+policy decides what happens to the new message:
+
+    "drop_oldest"  the oldest queued message is dropped
+    "conflate"     the newest queued message is replaced, with maxsize=1 the
+                   consumer always gets the latest message
+    "block"        nothing is dropped while the consumer catches up, the
+                   queue grows past maxsize. The data channel has no flow
+                   control so the robot can't really be blocked, the queue
+                   is capped at block_limit messages (10 * maxsize by
+                   default) past which the oldest are dropped with a
+                   warning. Use this for low rate topics that must not lose
+                   messages in a burst and watch the lag
+
+RateLimit decimates the messages of one subscriber, see
+pub_sub.subscribe(..., max_hz=..., every_nth=...).
+"""
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop_oldest", "block", "conflate")
+
+
+class CallbackSubscription:
+    def __init__(self, topic, callback, state_decoder=None, lidar_filter=None, rate_limit=None):
+        self.topic = topic
+        self.callback = callback
+        self.state_decoder = state_decoder
+        self.lidar_filter = lidar_filter
+        self.rate_limit = rate_limit
+        self.delivered = 0
+        self.errors = 0
+
+    def deliver(self, message):
+        self.delivered += 1
+        try:
+            self.callback(message)
+        except Exception:
+            self.errors += 1
+            logger.error("Subscriber callback for %s failed", self.topic, exc_info=True)
+
+    def stats(self):
+        return {"topic": self.topic, "kind": "callback", "delivered": self.delivered, "errors": self.errors}
+
+
+class AsyncCallbackSubscription:
+    def __init__(self, topic, callback, worker, state_decoder=None, lidar_filter=None, rate_limit=None):
+        """Awaits callback(message) on worker, in the order the messages arrived."""
+        self.topic = topic
+        self.callback = callback
+        self.worker = worker
+        self.state_decoder = state_decoder
+        self.lidar_filter = lidar_filter
+        self.rate_limit = rate_limit
+        self.received = 0
+        self.delivered = 0
+        self.errors = 0
+
+    def deliver(self, message):
+        self.received += 1
+        self.worker.submit(self, message)
+
+    def stats(self):
+        return {
+            "topic": self.topic,
+            "kind": "async_callback",
+            "received": self.received,
+            "delivered": self.delivered,
+            "errors": self.errors,
+            "dropped": self.worker.dropped,
+            "lag": self.worker.lag,
+        }
+
+
+class CallbackWorker:
+    def __init__(self, topic, slots, maxsize=100):
+        """
+        Serial worker of the async callbacks of one topic. A callback runs
+        once the previous one of the topic finished, and only while it holds
+        one of the in-flight slots shared by all topics, slots is a function
+        returning that asyncio.Semaphore. At most maxsize callbacks wait, the
+        oldest is dropped when more arrive.
+        """
+        self.topic = topic
+        self.slots = slots
+        self.maxsize = maxsize
+        self.queue = deque()  # (subscription, message) waiting to run
+        self.task = None
+        self.dropped = 0
+
+    @property
+    def lag(self):
+        return len(self.queue)
+
+    def submit(self, subscription, message):
+        if len(self.queue) >= self.maxsize:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append((subscription, message))
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    async def run(self):
+        slots = self.slots()
+        try:
+            while self.queue:
+                subscription, message = self.queue.popleft()
+                async with slots:
+                    try:
+                        await subscription.callback(message)
+                        subscription.delivered += 1
+                    except Exception:
+                        subscription.errors += 1
+                        logger.error("Subscriber callback for %s failed", self.topic, exc_info=True)
+        finally:
+            self.task = None
+
+    def cancel(self):
+        """Drop the waiting callbacks and cancel the running one."""
+        self.queue.clear()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+class TopicStream:
+    def __init__(self, topic, maxsize=100, policy="drop_oldest", state_decoder=None, on_close=None, block_limit=None):
+        """
+        Async iterator over the messages of topic, created by pub_sub.stream.
+        block_limit caps the queue of the "block" policy.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy}, expected one of {POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if block_limit is None:
+            block_limit = 10 * maxsize
+        if block_limit < maxsize:
+            raise ValueError("block_limit must be at least maxsize")
+        self.topic = topic
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_limit = block_limit
+        self.overrun = False  # "block" queue hit block_limit, warned until it drains
+        self.state_decoder = state_decoder
+        self.lidar_filter = None
+        self.rate_limit = None
+        self.on_close = on_close
+        self.queue = deque()
+        self.waiter = None  # future the consumer waits on while the queue is empty
+        self.closed = False
+
+        self.received = 0  # messages offered to the stream
+        self.delivered = 0  # messages handed to the consumer
+        self.dropped = 0  # messages dropped or replaced by the overflow policy
+        self.max_lag = 0  # most messages ever queued at once
+
+    def deliver(self, message):
+        """Queue message, called on the receive path, never blocks."""
+        if self.closed:
+            return
+        self.received += 1
+        queue = self.queue
+        if len(queue) >= self.maxsize:
+            if self.policy == "drop_oldest":
+                queue.popleft()
+                self.dropped += 1
+            elif self.policy == "conflate":
+                queue[-1] = message
+                self.dropped += 1
+                return
+            elif len(queue) >= self.block_limit:
+                queue.popleft()
+                self.dropped += 1
+                if not self.overrun:
+                    self.overrun = True
+                    logger.warning("Stream of %s overran %d queued messages, dropping the oldest", self.topic, self.block_limit)
+        elif self.overrun:
+            # Drained below maxsize, warn again on the next overrun
+            self.overrun = False
+        queue.append(message)
+        if len(queue) > self.max_lag:
+            self.max_lag = len(queue)
+
+        waiter = self.waiter
+        if waiter is not None:
+            self.waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @property
+    def lag(self):
+        """Messages received but not yet consumed."""
+        return len(self.queue)
+
+    def stats(self):
+        return {
+            "topic": self.topic,
+            "kind": "stream",
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+        }
+
+    def close(self):
+        """Stop the stream, a consumer waiting in async for finishes."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+        self.waiter = None
+        if self.on_close:
+            self.on_close(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.queue:
+            if self.closed:
+                raise StopAsyncIteration
+            self.waiter = asyncio.get_running_loop().create_future()
+            await self.waiter
+        self.delivered += 1
+        return self.queue.popleft()
+
+
+class RateLimit:
+    def __init__(self, max_hz=None, every_nth=None):
+        """
+        Decimation of a subscription, passes every every_nth message and at
+        most max_hz messages per second. Either may be None.
+        """
+        if max_hz is not None and max_hz <= 0:
+            raise ValueError("max_hz must be positive")
+        if every_nth is not None and (int(every_nth) != every_nth or every_nth < 1):
+            raise ValueError("every_nth must be a positive integer")
+        self.max_hz = max_hz
+        self.every_nth = every_nth
+        self.interval = 1.0 / max_hz if max_hz else 0.0
+        self.next_time = float("-inf")  # monotonic time the next message may pass
+        self.seen = 0
+        self.accepted = 0
+        self.decimated = 0
+
+    def peek(self, now):
+        """Whether a message arriving at now would pass, without counting it."""
+        if self.every_nth and self.seen % self.every_nth:
+            return False
+        return not self.interval or now >= self.next_time
+
+    def accept(self, now):
+        """Whether the message arriving at monotonic time now passes."""
+        self.seen += 1
+        if self.every_nth and (self.seen - 1) % self.every_nth:
+            self.decimated += 1
+            return False
+        if self.interval:
+            if now < self.next_time:
+                self.decimated += 1
+                return False
+            # Stay on the max_hz grid so jitter doesn't lower the rate, unless
+            # the topic was quiet for longer than an interval
+            if now - self.next_time < self.interval:
+                self.next_time += self.interval
+            else:
+                self.next_time = now + self.interval
+        self.accepted += 1
+        return True
+
+    def stats(self):
+        return {"max_hz": self.max_hz, "every_nth": self.every_nth, "accepted": self.accepted, "decimated": self.decimated}
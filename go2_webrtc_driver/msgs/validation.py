@@ -2,6 +2,8 @@ import logging
 import base64
 from ..constants import DATA_CHANNEL_TYPE
 
+logger = logging.getLogger(__name__)
+
 class WebRTCDataChannelValidaton:
     def __init__(self, channel, pub_sub):
         self.channel = channel
@@ -16,7 +18,7 @@ class WebRTCDataChannelValidaton:
     
     async def handle_response(self, message):
         if message.get("data") == "Validation Ok.":
-            logging.info("Validation succeed")
+            logger.info("Validation succeed")
             for callback in self.on_validate_callbacks:
                 callback()
         else:
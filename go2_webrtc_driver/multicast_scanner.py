@@ -3,6 +3,8 @@ import struct
 import json
 import logging
 
+logger = logging.getLogger(__name__)
+
 RECV_PORT = 10134  # Port where the devices will send the multicast responses
 MULTICAST_GROUP = '231.1.1.1'  # Multicast group IP address
 MULTICAST_PORT = 10131  # Port to send multicast query to devices
@@ -31,7 +33,7 @@ def discover_ip_sn(timeout=2):
     try:
         sock.sendto(query_message.encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
     except Exception as e:
-        logging.error(f"Error sending multicast query: {e}")
+        logger.error(f"Error sending multicast query: {e}")
         sock.close()
         return serial_to_ip
 
@@ -51,11 +53,11 @@ def discover_ip_sn(timeout=2):
                 serial_to_ip[serial_number] = ip_address
                 print(f"Discovered device: {serial_number} at {ip_address}")
     except socket.timeout:
-        logging.info("Timeout reached, stopping listening.")
+        logger.info("Timeout reached, stopping listening.")
     except json.JSONDecodeError as e:
-        logging.error(f"Error decoding JSON message: {e}")
+        logger.error(f"Error decoding JSON message: {e}")
     except Exception as e:
-        logging.error(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
     finally:
         # Close the socket
         sock.close()
@@ -0,0 +1,222 @@
+"""
+Staged receive path for the data channel.
+
+Without a pipeline every received message is parsed, decoded and dispatched
+in the aiortc "message" handler. With one the handler only queues the raw
+message and two stages, each a task with its own bounded queue, do the rest:
+
+    ingest -> [parse queue] -> parse/decode -> [dispatch queue] -> dispatch
+
+Parse turns the message into a dict, decoding binary bodies inline or on the
+LidarDecodeExecutor. Dispatch resolves pending requests and runs the
+subscribers and response handlers.
+
+Every queue has two lanes. Control messages (responses, heartbeats, errors,
+topic data a request waits on) are never dropped and are served first. Bulk
+messages (binary frames and other topic data, text included, told apart with
+a substring check before parsing) are bounded by maxsize and dropped by the
+overflow policy, "drop_oldest" or "drop_newest". A lidar burst, a 500 Hz
+lowstate stream or a large file download therefore can't push out a request
+response or a heartbeat.
+
+Dispatch doesn't wait for response handlers, they run as tasks of their own
+like they did in the aiortc handler, so one waiting for a later message
+doesn't hold up the queue.
+
+    pipeline = conn.datachannel.enable_receive_pipeline(parse_queue_size=64)
+    pipeline.stats()
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop_oldest", "drop_newest")
+
+# Upper bounds of the processing time histogram buckets in microseconds,
+# powers of two up to about one second, the last bucket is unbounded
+HISTOGRAM_BOUNDS_US = tuple(2 ** i for i in range(21))
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+        self.count = 0
+        self.total = 0.0  # seconds
+
+    def record(self, seconds):
+        microseconds = seconds * 1e6
+        index = 0
+        if microseconds > 1:
+            # Smallest power of two bucket that holds microseconds
+            index = min((math.ceil(microseconds) - 1).bit_length(), len(HISTOGRAM_BOUNDS_US))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction):
+        """Upper bound in microseconds of the bucket holding the given fraction, None if empty."""
+        if not self.count:
+            return None
+        threshold = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold:
+                return HISTOGRAM_BOUNDS_US[index] if index < len(HISTOGRAM_BOUNDS_US) else float("inf")
+        return float("inf")
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else None,
+            "p50_us": self.percentile(0.5),
+            "p99_us": self.percentile(0.99),
+            "buckets_us": {
+                (HISTOGRAM_BOUNDS_US[index] if index < len(HISTOGRAM_BOUNDS_US) else "inf"): count
+                for index, count in enumerate(self.counts) if count
+            },
+        }
+
+
+class ReceiveStage:
+    # Seconds of work, or items, after which the stage yields to the event loop
+    BUDGET = 0.001
+    BATCH = 64
+
+    def __init__(self, name, handler, maxsize=256, policy="drop_oldest"):
+        """handler(item) processes one queued item, it may return a coroutine."""
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy}, expected one of {POLICIES}")
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.name = name
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.control = deque()
+        self.bulk = deque()
+        self.waiter = None
+        self.task = None
+
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.histogram = LatencyHistogram()
+
+    @property
+    def depth(self):
+        return len(self.control) + len(self.bulk)
+
+    def put(self, item, droppable):
+        if not droppable:
+            self.control.append(item)
+        elif len(self.bulk) < self.maxsize:
+            self.bulk.append(item)
+        elif self.policy == "drop_oldest":
+            self.bulk.popleft()
+            self.bulk.append(item)
+            self.dropped += 1
+        else:
+            self.dropped += 1
+            return
+
+        depth = self.depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+        elif self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch_start = time.perf_counter()
+            for _ in range(self.BATCH):
+                if self.control:
+                    item = self.control.popleft()
+                elif self.bulk:
+                    item = self.bulk.popleft()
+                else:
+                    break
+                start = time.perf_counter()
+                try:
+                    result = self.handler(item)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    self.errors += 1
+                    logger.error("Error in receive stage %s", self.name, exc_info=True)
+                end = time.perf_counter()
+                self.histogram.record(end - start)
+                self.processed += 1
+                if end - batch_start > self.BUDGET:
+                    break
+
+            if self.control or self.bulk:
+                # Let the other stages and the event loop run between batches
+                await asyncio.sleep(0)
+            else:
+                self.waiter = loop.create_future()
+                await self.waiter
+                self.waiter = None
+
+    def stop(self):
+        """Cancel the stage task and drop everything still queued."""
+        self.control.clear()
+        self.bulk.clear()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "processing_time": self.histogram.stats(),
+        }
+
+
+class ReceivePipeline:
+    def __init__(self, parse, dispatch, is_bulk_raw, is_bulk, parse_queue_size=256, dispatch_queue_size=256, policy="drop_oldest"):
+        """
+        parse(raw) returns the message dict, or None when there is nothing to
+        dispatch (decimated, or handed to the decode executor which then calls
+        dispatch_parsed). dispatch(message) may return a coroutine, it should
+        not wait on later messages. is_bulk_raw(raw) and is_bulk(message) tell
+        whether a received and a parsed message may be dropped.
+        """
+        self.is_bulk_raw = is_bulk_raw
+        self.is_bulk = is_bulk
+        self.parse = parse
+        self.parse_stage = ReceiveStage("parse", self.parse_raw, parse_queue_size, policy)
+        self.dispatch_stage = ReceiveStage("dispatch", dispatch, dispatch_queue_size, policy)
+
+    def ingest(self, raw):
+        """Queue a received message."""
+        self.parse_stage.put(raw, self.is_bulk_raw(raw))
+
+    def parse_raw(self, raw):
+        message = self.parse(raw)
+        if message is not None:
+            self.dispatch_parsed(message)
+
+    def dispatch_parsed(self, message):
+        self.dispatch_stage.put(message, self.is_bulk(message))
+
+    def stop(self):
+        self.parse_stage.stop()
+        self.dispatch_stage.stop()
+
+    def stats(self):
+        return {"parse": self.parse_stage.stats(), "dispatch": self.dispatch_stage.stats()}
@@ -11,6 +11,8 @@ import sys
 from Crypto.PublicKey import RSA
 from .encryption import aes_encrypt, generate_aes_key, rsa_encrypt, aes_decrypt, rsa_load_public_key
 
+logger = logging.getLogger(__name__)
+
 def _calc_local_path_ending(data1):
     # Initialize an array of strings
     strArr = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]
@@ -109,12 +111,12 @@ def make_local_request(path, body=None, headers=None):
 
     except requests.exceptions.RequestException as e:
         # Handle any exception related to the request (e.g., connection errors, timeouts)
-        logging.error(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
         return None
 
 # Function to send SDP to peer and receive the answer
 def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key: RSA.RsaKey) -> str:
-    logging.info("Sending SDP to Go2...")
+    logger.info("Sending SDP to Go2...")
     aes_key = generate_aes_key()
     path = "webrtc/connect"
     body = {
@@ -125,7 +127,7 @@ def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key
     }
     response = make_remote_request(path, body, token=access_token, method="POST")
     if response.get("code") == 100:
-        logging.info("Received SDP Answer from Go2!")
+        logger.info("Received SDP Answer from Go2!")
         return aes_decrypt(response['data'], aes_key)
     elif response.get("code") == 1000:
         print("Device not online")
@@ -138,28 +140,28 @@ def send_sdp_to_remote_peer(serial: str, sdp: str, access_token: str, public_key
 def send_sdp_to_local_peer(ip, sdp):
     # try:
     #     # Try the old method first
-    #     logging.info("Trying to send SDP using the old method...")
+    #     logger.info("Trying to send SDP using the old method...")
     #     response = send_sdp_to_local_peer_old_method(ip, sdp)
     #     if response:
-    #         logging.info("SDP successfully sent using the old method.")
+    #         logger.info("SDP successfully sent using the old method.")
     #         return response
     #     else:
-    #         logging.warning("Old method failed, trying the new method...")
+    #         logger.warning("Old method failed, trying the new method...")
     # except Exception as e:
-    #     logging.error(f"An error occurred with the old method: {e}")
-    #     logging.info("Falling back to the new method...")
+    #     logger.error(f"An error occurred with the old method: {e}")
+    #     logger.info("Falling back to the new method...")
 
     # Now try the new method after the old method has failed
     try:
         response = send_sdp_to_local_peer_new_method(ip, sdp)  # Use the new method here
         if response:
-            logging.info("SDP successfully sent using the new method.")
+            logger.info("SDP successfully sent using the new method.")
             return response
         else:
-            logging.error("New method failed to send SDP.")
+            logger.error("New method failed to send SDP.")
             return None
     except Exception as e:
-        logging.error(f"An error occurred with the new method: {e}")
+        logger.error(f"An error occurred with the new method: {e}")
         return None
 
 
@@ -186,14 +188,14 @@ def send_sdp_to_local_peer_old_method(ip, sdp):
         
         # Check if the response is valid
         if response and response.status_code == 200:
-            logging.debug(f"Recieved SDP: {response.text}")
+            logger.debug(f"Recieved SDP: {response.text}")
             return response.text
         else:
             raise ValueError(f"Failed to receive SDP Answer: {response.status_code if response else 'No response'}")
 
     except requests.exceptions.RequestException as e:
         # Handle any exceptions that occur during the request
-        logging.error(f"An error occurred while sending the SDP: {e}")
+        logger.error(f"An error occurred while sending the SDP: {e}")
         return None
 
             
@@ -208,7 +210,7 @@ def send_sdp_to_local_peer_new_method(ip, sdp):
         if response:
             # Decode the response text from base64
             decoded_response = base64.b64decode(response.text).decode('utf-8')
-            logging.debug(f"Recieved con_notify response: {decoded_response}")
+            logger.debug(f"Recieved con_notify response: {decoded_response}")
 
             # Parse the decoded response as JSON
             decoded_json = json.loads(decoded_response)
@@ -244,22 +246,22 @@ def send_sdp_to_local_peer_new_method(ip, sdp):
             # If response is successful, decrypt it
             if response:
                 decrypted_response = aes_decrypt(response.text, aes_key)
-                logging.debug(f"Recieved con_ing_{path_ending} response: {decrypted_response}")
+                logger.debug(f"Recieved con_ing_{path_ending} response: {decrypted_response}")
                 return decrypted_response
         else:
             raise ValueError("Failed to receive initial public key response.")
 
     except requests.exceptions.RequestException as e:
         # Handle any exceptions that occur during the request
-        logging.error(f"An error occurred while sending the SDP: {e}")
+        logger.error(f"An error occurred while sending the SDP: {e}")
         return None
     except json.JSONDecodeError as e:
         # Handle JSON decoding errors
-        logging.error(f"An error occurred while decoding JSON: {e}")
+        logger.error(f"An error occurred while decoding JSON: {e}")
         return None
     except base64.binascii.Error as e:
         # Handle base64 decoding errors
-        logging.error(f"An error occurred while decoding base64: {e}")
+        logger.error(f"An error occurred while decoding base64: {e}")
         return None
 
 
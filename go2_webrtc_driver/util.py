@@ -8,6 +8,8 @@ from Crypto.PublicKey import RSA
 from .unitree_auth import make_remote_request
 from .encryption import rsa_encrypt, rsa_load_public_key, aes_decrypt, generate_aes_key
 
+logger = logging.getLogger(__name__)
+
 # Function to generate MD5 hash of a string
 
 def _generate_md5(string: str) -> str:
@@ -37,7 +39,7 @@ def get_nested_field(message, *fields):
 
 # Function to obtain a fresh token from the backend server
 def fetch_token(email: str, password: str) -> str:
-    logging.info("Obtaining TOKEN...")
+    logger.info("Obtaining TOKEN...")
     path = "login/email"
     body = {
         'email': email,
@@ -49,13 +51,13 @@ def fetch_token(email: str, password: str) -> str:
         access_token = data.get("accessToken")
         return access_token
     else:
-        logging.error("Failed to receive token")
+        logger.error("Failed to receive token")
         return None
 
 
 # Function to obtain a public key
 def fetch_public_key() -> RSA.RsaKey:
-    logging.info("Obtaining a Public key...")
+    logger.info("Obtaining a Public key...")
     path = "system/pubKey"
     
     try:
@@ -66,23 +68,23 @@ def fetch_public_key() -> RSA.RsaKey:
             public_key_pem = response.get("data")
             return rsa_load_public_key(public_key_pem)
         else:
-            logging.error("Failed to receive public key")
+            logger.error("Failed to receive public key")
             return None
 
     except requests.exceptions.ConnectionError as e:
         # Handle no internet connection or other connection errors
-        logging.warning("No internet connection or failed to connect to the server. Unable to fetch public key.")
-        logging.error(f"Connection error: {e}")
+        logger.warning("No internet connection or failed to connect to the server. Unable to fetch public key.")
+        logger.error(f"Connection error: {e}")
         return None
     except requests.exceptions.RequestException as e:
         # Handle other request exceptions
-        logging.error(f"An error occurred while fetching the public key: {e}")
+        logger.error(f"An error occurred while fetching the public key: {e}")
         return None
 
 
 # Function to obtain TURN server info
 def fetch_turn_server_info(serial: str, access_token: str, public_key: RSA.RsaKey) -> dict:
-    logging.info("Obtaining TURN server info...")
+    logger.info("Obtaining TURN server info...")
     aes_key = generate_aes_key()
     path = "webrtc/account"
     body = {
@@ -93,7 +95,7 @@ def fetch_turn_server_info(serial: str, access_token: str, public_key: RSA.RsaKe
     if response.get("code") == 100:
         return json.loads(aes_decrypt(response['data'], aes_key))
     else:
-        logging.error("Failed to receive TURN server info")
+        logger.error("Failed to receive TURN server info")
         return None
 
 def print_status(status_type, status_message):
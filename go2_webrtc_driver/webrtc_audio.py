@@ -5,6 +5,8 @@ import sounddevice as sd
 import numpy as np
 import wave
 
+logger = logging.getLogger(__name__)
+
 
 class WebRTCAudioChannel:
     def __init__(self, pc, datachannel) -> None:
@@ -16,7 +18,7 @@ class WebRTCAudioChannel:
         self.track_callbacks = []
         
     async def frame_handler(self, frame):
-        logging.info("Receiving audio frame")
+        logger.info("Receiving audio frame")
 
         # Trigger all registered callbacks
         for callback in self.track_callbacks:
@@ -24,7 +26,7 @@ class WebRTCAudioChannel:
                 # Call each callback function and pass the track
                 await callback(frame)
             except Exception as e:
-                logging.error(f"Error in callback {callback}: {e}")
+                logger.error(f"Error in callback {callback}: {e}")
     
     def add_track_callback(self, callback):
         """
@@ -33,7 +35,7 @@ class WebRTCAudioChannel:
         if callable(callback):
             self.track_callbacks.append(callback)
         else:
-            logging.warning(f"Callback {callback} is not callable.")  
+            logger.warning(f"Callback {callback} is not callable.")  
 
     def switchAudioChannel(self, switch: bool):
         self.datachannel.switchAudioChannel(switch)
@@ -8,6 +8,8 @@ import hashlib
 from pydub import AudioSegment
 from go2_webrtc_driver.constants import AUDIO_API
 from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection
+from go2_webrtc_driver.msgs.request_client import RequestClient
+from go2_webrtc_driver.util import get_nested_field
 import asyncio
 
 CHUNK_SIZE = 61440
@@ -25,6 +27,8 @@ class WebRTCAudioHub:
             self.logger.error("WebRTC connection not established")
             raise RuntimeError("WebRTC connection not established")
         self.data_channel = self.conn.datachannel
+        # Upload chunks are pipelined, a chunk is sent before the previous one is acknowledged
+        self.upload_requests = RequestClient(self.data_channel.pub_sub, window=4)
 
     async def get_audio_list(self):
         """Get list of available audio files"""
@@ -152,8 +156,8 @@ class WebRTCAudioHub:
             self.logger.info(f"Splitting file into {total_chunks} chunks")
 
             # Send each chunk
-            for i, chunk in enumerate(chunks, 1):
-                parameter = {
+            parameters = [
+                {
                     'file_name': os.path.splitext(os.path.basename(audiofile_path))[0],
                     'file_type': 'wav',
                     'file_size': len(audio_data),
@@ -164,21 +168,9 @@ class WebRTCAudioHub:
                     'file_md5': file_md5,
                     'create_time': int(time.time() * 1000)
                 }
-                print(json.dumps(parameter, ensure_ascii=True))
-                # Send the chunk
-                self.logger.info(f"Sending chunk {i}/{total_chunks}")
-                
-                response = await self.data_channel.pub_sub.publish_request_new(
-                    "rt/api/audiohub/request",
-                    {
-                        "api_id": AUDIO_API['UPLOAD_AUDIO_FILE'],
-                        "parameter": json.dumps(parameter, ensure_ascii=True)
-                    }
-                )
-                
-                # Wait a small amount between chunks
-                await asyncio.sleep(0.1)
-                
+                for i, chunk in enumerate(chunks, 1)
+            ]
+            response = await self._send_chunks(AUDIO_API['UPLOAD_AUDIO_FILE'], parameters)
             self.logger.info("All chunks sent")
             return response
             
@@ -238,30 +230,58 @@ class WebRTCAudioHub:
             self.logger.info(f"Splitting file into {total_chunks} chunks")
 
             # Send each chunk
-            for i, chunk in enumerate(chunks, 1):
-                parameter = {
+            parameters = [
+                {
                     'current_block_size': len(chunk),
                     'block_content': chunk,
                     'current_block_index': i,
                     'total_block_number': total_chunks
                 }
+                for i, chunk in enumerate(chunks, 1)
+            ]
+            response = await self._send_chunks(AUDIO_API['UPLOAD_MEGAPHONE'], parameters)
+            self.logger.info("All chunks sent")
+            return response
+        except Exception as e:
+            self.logger.error(f"Error uploading audio file: {e}")
+            raise
+
+    async def _send_chunks(self, api_id, parameters):
+        """
+        Send the upload chunks in order, pipelined, and return the response
+        of the last one. Raises RuntimeError when the audiohub rejects a
+        chunk. On any error the chunks still in flight are cancelled.
+        """
+        total_chunks = len(parameters)
+        pending = []
+        try:
+            for i, parameter in enumerate(parameters, 1):
                 print(json.dumps(parameter, ensure_ascii=True))
                 # Send the chunk
                 self.logger.info(f"Sending chunk {i}/{total_chunks}")
-                
-                response = await self.data_channel.pub_sub.publish_request_new(
+
+                pending.append(await self.upload_requests.submit(
                     "rt/api/audiohub/request",
                     {
-                        "api_id": AUDIO_API['UPLOAD_MEGAPHONE'],
+                        "api_id": api_id,
                         "parameter": json.dumps(parameter, ensure_ascii=True)
                     }
-                )
-                
+                ))
+
                 # Wait a small amount between chunks
                 await asyncio.sleep(0.1)
-                
-            self.logger.info("All chunks sent")
+
+            # Chunks are sent in order but acknowledged later, a rejected
+            # chunk fails the upload even if later ones were accepted
+            response = None
+            for i, future in enumerate(pending, 1):
+                response = await future
+                code = get_nested_field(response, "data", "header", "status", "code")
+                if code != 0:
+                    raise RuntimeError(f"Audiohub rejected chunk {i}/{total_chunks} with status {code}")
             return response
-        except Exception as e:
-            self.logger.error(f"Error uploading audio file: {e}")
-            raise
\ No newline at end of file
+        finally:
+            for future in pending:
+                future.cancel()
+            # Collect what the cancelled and failed chunks raised
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -4,16 +4,30 @@ import logging
 import struct
 import sys
 from .msgs.pub_sub import WebRTCDataChannelPubSub
-from .lidar.lidar_decoder import LidarDecoder
 from .msgs.heartbeat import WebRTCDataChannelHeartBeat
 from .msgs.validation import WebRTCDataChannelValidaton
 from .msgs.rtc_inner_req import WebRTCDataChannelRTCInnerReq
+from .msgs.motion_scheduler import MotionScheduler
 from .util import print_status
 from .msgs.error_handler import handle_error
+from .msgs.message_log import message_log
+from .receive_pipeline import ReceivePipeline
+from . import json_codec
 
 from .constants import DATA_CHANNEL_TYPE
 
-decoder = LidarDecoder()
+logger = logging.getLogger(__name__)
+
+# Created on the first binary frame, most sessions never receive one. The import
+# is deferred too, it pulls in numpy and wasmtime.
+decoder = None
+
+def get_decoder():
+    global decoder
+    if decoder is None:
+        from .lidar.lidar_decoder import LidarDecoder
+        decoder = LidarDecoder()
+    return decoder
 
 class WebRTCDataChannel:
     def __init__(self, conn, pc) -> None:
@@ -23,10 +37,32 @@ class WebRTCDataChannel:
 
         self.pub_sub = WebRTCDataChannelPubSub(self.channel)
 
+        # Optional LidarDecodeExecutor, decodes binary frames off the event loop
+        self.lidar_decode_executor = None
+
+        # Optional ReceivePipeline, queues received messages between stages
+        self.receive_pipeline = None
+
         self.heartbeat = WebRTCDataChannelHeartBeat(self.channel, self.pub_sub)
         self.validaton = WebRTCDataChannelValidaton(self.channel, self.pub_sub)
         self.rtc_inner_req = WebRTCDataChannelRTCInnerReq(self.conn, self.channel, self.pub_sub)
 
+        # Sends Move commands at a fixed rate, see msgs/motion_scheduler.py
+        self.motion = MotionScheduler(self.pub_sub)
+
+        # Message type -> handler, may return a coroutine
+        self.response_handlers = {
+            DATA_CHANNEL_TYPE["VALIDATION"]: self.validaton.handle_response,
+            DATA_CHANNEL_TYPE["RTC_INNER_REQ"]: self.rtc_inner_req.handle_response,
+            DATA_CHANNEL_TYPE["HEARTBEAT"]: self.heartbeat.handle_response,
+            DATA_CHANNEL_TYPE["ERRORS"]: self.handle_error_message,
+            DATA_CHANNEL_TYPE["ADD_ERROR"]: self.handle_error_message,
+            DATA_CHANNEL_TYPE["RM_ERROR"]: self.handle_error_message,
+            DATA_CHANNEL_TYPE["ERR"]: self.validaton.handle_err_response,
+        }
+        self.handled_responses = 0
+        self.response_tasks = set()  # handlers running detached, see dispatch_detached
+
         #Event handler for Validation succeed
         def on_validate():
             self.data_channel_opened = True
@@ -46,61 +82,174 @@ class WebRTCDataChannel:
         # Event handler for data channel open
         @self.channel.on("open")
         def on_open():
-            logging.info("Data channel opened")
+            logger.info("Data channel opened")
 
         # Event handler for data channel close
         @self.channel.on("close")
         def on_close():
-            logging.info("Data channel closed")
+            logger.info("Data channel closed")
             self.data_channel_opened = False
             self.heartbeat.stop_heartbeat()
             self.rtc_inner_req.network_status.stop_network_status_fetch()
+            if self.receive_pipeline:
+                self.receive_pipeline.stop()
+            self.pub_sub.future_resolver.stop_sweeper()
+            self.motion.cancel()
             
         # Event handler for data channel messages
         @self.channel.on("message")
         async def on_message(message):
-            logging.info("Received message on data channel: %s", message)
             try:
             
                 # Check if the message is not empty
                 if not message:
                     return
 
-                # Determine how to parse the 'data' field
-                if isinstance(message, str):
-                    parsed_data = json.loads(message)
-                elif isinstance(message, bytes):
-                    parsed_data = WebRTCDataChannel.deal_array_buffer(message)
-                
-                # Resolve any pending futures or callbacks associated with this message
-                self.pub_sub.run_resolve(parsed_data)
-
-                # Handle the response
-                await self.handle_response(parsed_data)
+                if self.receive_pipeline:
+                    self.receive_pipeline.ingest(message)
+                    return
+
+                parsed_data = self.parse_message(message)
+                if parsed_data is not None:
+                    await self.dispatch_message(parsed_data)
         
             except json.JSONDecodeError:
-                logging.error("Failed to decode JSON message: %s", message, exc_info=True)
+                logger.error("Failed to decode JSON message: %s", message, exc_info=True)
             except Exception as error:
-                logging.error("Error processing WebRTC data", exc_info=True)
+                logger.error("Error processing WebRTC data", exc_info=True)
+
+    def parse_message(self, message):
+        """
+        Parse a received message into a dict. Returns None when the message
+        was decimated or its body went to the decode executor.
+        """
+        # Determine how to parse the 'data' field
+        if isinstance(message, str):
+            parsed_data = json_codec.loads(message)
+            message_log.received(parsed_data.get("topic"), message)
+            if not self.pub_sub.admit(parsed_data):
+                return None
+        elif isinstance(message, bytes):
+            decoded_json, binary_data = WebRTCDataChannel.parse_array_buffer(message)
+            message_log.received(decoded_json.get("topic"), message)
+            # Decimated frames are dropped before the body is decoded
+            if not self.pub_sub.admit(decoded_json):
+                return None
+            lidar_filter = self.pub_sub.lidar_filters.get(decoded_json.get("topic"))
+            if self.lidar_decode_executor:
+                self.lidar_decode_executor.submit(decoded_json, binary_data, self.on_decoded_message, lidar_filter)
+                return None
+            parsed_data = WebRTCDataChannel.decode_array_buffer(decoded_json, binary_data, lidar_filter)
+        else:
+            return None
+        return parsed_data
+
+    async def dispatch_message(self, parsed_data):
+        # Resolve any pending futures or callbacks associated with this message
+        self.pub_sub.run_resolve(parsed_data)
+
+        # Handle the response, plain topic messages have no handler
+        if parsed_data.get("type") in self.response_handlers:
+            self.handled_responses += 1
+            await self.handle_response(parsed_data)
+
+    def dispatch_detached(self, parsed_data):
+        """
+        Like dispatch_message, but the response handler runs as its own task
+        rather than being awaited. A handler may wait for a later message,
+        handle_err_response waits for the validation reply, so the receive
+        pipeline and the decode executor must not wait for it.
+        """
+        self.pub_sub.run_resolve(parsed_data)
+        if parsed_data.get("type") in self.response_handlers:
+            self.handled_responses += 1
+            # Referenced until done, the loop only keeps a weak reference
+            task = asyncio.ensure_future(self.handle_response(parsed_data))
+            self.response_tasks.add(task)
+            task.add_done_callback(self.on_response_task_done)
+
+    def on_response_task_done(self, task):
+        self.response_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error processing WebRTC data", exc_info=task.exception())
+
+    def is_bulk_raw(self, message):
+        """
+        Whether a received message is bulk before it is parsed: binary frames,
+        and text topic data ("type": "msg") that names no topic a request
+        waits on. Anything else is control and never dropped.
+        """
+        if isinstance(message, bytes):
+            return True
+        if '"type":"msg"' not in message and '"type": "msg"' not in message:
+            return False
+        # Few requests are pending at a time, so this stays cheap
+        for topic in self.pub_sub.future_resolver.pending_topics:
+            if '"' + topic + '"' in message:
+                return False
+        return True
+
+    def is_bulk_message(self, parsed_data):
+        """Topic data nobody waits on, the receive pipeline may drop it."""
+        return parsed_data.get("type") == DATA_CHANNEL_TYPE["MSG"] and parsed_data.get("topic") not in self.pub_sub.future_resolver.pending_topics
+
+    def enable_receive_pipeline(self, parse_queue_size=256, dispatch_queue_size=256, policy="drop_oldest"):
+        """
+        Receive through a ReceivePipeline with the given queue sizes and
+        overflow policy, see receive_pipeline.py. Returns the pipeline.
+        """
+        pipeline = ReceivePipeline(
+            self.parse_message, self.dispatch_detached, self.is_bulk_raw, self.is_bulk_message,
+            parse_queue_size, dispatch_queue_size, policy,
+        )
+        self.disable_receive_pipeline()
+        self.receive_pipeline = pipeline
+        return pipeline
+
+    def disable_receive_pipeline(self):
+        """Go back to handling each message in the aiortc handler, queued ones are dropped."""
+        if self.receive_pipeline:
+            self.receive_pipeline.stop()
+            self.receive_pipeline = None
 
+    def get_pipeline_stats(self):
+        """Queue depth, drops and processing time per stage, None without a pipeline."""
+        return self.receive_pipeline.stats() if self.receive_pipeline else None
+
+    def set_lidar_decode_executor(self, executor):
+        """Decode binary frames with the given LidarDecodeExecutor, or inline if None."""
+        if self.lidar_decode_executor and self.lidar_decode_executor is not executor:
+            self.lidar_decode_executor.shutdown(wait=False)
+        self.lidar_decode_executor = executor
+
+    def on_decoded_message(self, parsed_data):
+        """Called on the event loop when the decode executor finished a frame."""
+        if self.receive_pipeline:
+            self.receive_pipeline.dispatch_parsed(parsed_data)
+            return
+        try:
+            self.dispatch_detached(parsed_data)
+        except Exception:
+            logger.error("Error processing WebRTC data", exc_info=True)
 
     async def handle_response(self, msg: dict):
-        msg_type = msg["type"]
-
-        if msg_type == DATA_CHANNEL_TYPE["VALIDATION"]:
-            await self.validaton.handle_response(msg)
-        elif msg_type == DATA_CHANNEL_TYPE["RTC_INNER_REQ"]:
-            self.rtc_inner_req.handle_response(msg)
-        elif msg_type == DATA_CHANNEL_TYPE["HEARTBEAT"]:
-            self.heartbeat.handle_response(msg)
-        elif msg_type in {DATA_CHANNEL_TYPE["ERRORS"], DATA_CHANNEL_TYPE["ADD_ERROR"], DATA_CHANNEL_TYPE["RM_ERROR"]}:
-            try:
-                handle_error(msg)
-            except Exception as e:
-                logging.error(f"Failed to handle error message: {msg}")
-                logging.error(f"Error details: {str(e)}")
-        elif msg_type == DATA_CHANNEL_TYPE["ERR"]:
-            await self.validaton.handle_err_response(msg)
+        handler = self.response_handlers.get(msg["type"])
+        if handler is None:
+            return
+        result = handler(msg)
+        if asyncio.iscoroutine(result):
+            await result
+
+    def handle_error_message(self, msg: dict):
+        try:
+            handle_error(msg)
+        except Exception as e:
+            logger.error(f"Failed to handle error message: {msg}")
+            logger.error(f"Error details: {str(e)}")
+
+    def get_dispatch_stats(self):
+        """Number of received messages per dispatch path."""
+        return dict(self.pub_sub.dispatch_counts, handler=self.handled_responses)
         
 
     async def wait_datachannel_open(self, timeout=5):
@@ -117,36 +266,55 @@ class WebRTCDataChannel:
             await asyncio.sleep(0.1)
     
     @staticmethod
-    def deal_array_buffer(buffer):
-        header_1, header_2 = struct.unpack_from('<HH', buffer, 0)
-        if header_1 == 2 and header_2 == 0:
-            return WebRTCDataChannel.deal_array_buffer_for_lidar(buffer[4:])
-        else:
-            return WebRTCDataChannel.deal_array_buffer_for_normal(buffer)
+    def deal_array_buffer(buffer, lidar_filter=None):
+        decoded_json, binary_data = WebRTCDataChannel.parse_array_buffer(buffer)
+        return WebRTCDataChannel.decode_array_buffer(decoded_json, binary_data, lidar_filter)
     @staticmethod
-    def deal_array_buffer_for_normal(buffer):
-        header_length, = struct.unpack_from('<H', buffer, 0)
-        json_data = buffer[4:4 + header_length]
-        binary_data = buffer[4 + header_length:]
-
-        decoded_json = json.loads(json_data.decode('utf-8'))
-
-        decoded_data = decoder.decode(binary_data, decoded_json['data'])
+    def decode_array_buffer(decoded_json, binary_data, lidar_filter=None):
+        """Decode the body of a split binary message into decoded_json['data']['data']."""
+        if lidar_filter:
+            decoded_data = lidar_filter.decode(get_decoder(), binary_data, decoded_json['data'])
+        else:
+            decoded_data = get_decoder().decode(binary_data, decoded_json['data'])
 
         decoded_json['data']['data'] = decoded_data
         return decoded_json
     @staticmethod
-    def deal_array_buffer_for_lidar(buffer):
-        header_length, = struct.unpack_from('<I', buffer, 0)
-        json_data = buffer[8:8 + header_length]
-        binary_data = buffer[8 + header_length:]
-
-        decoded_json = json.loads(json_data.decode('utf-8'))
+    def parse_array_buffer(buffer):
+        """
+        Split a binary message into its JSON header and the still compressed
+        body. The body is a memoryview into buffer, nothing is copied.
+        """
+        view = memoryview(buffer)
+        header_1, header_2 = struct.unpack_from('<HH', view, 0)
+        if header_1 == 2 and header_2 == 0:
+            return WebRTCDataChannel.parse_array_buffer_for_lidar(view[4:])
+        else:
+            return WebRTCDataChannel.parse_array_buffer_for_normal(view)
+    @staticmethod
+    def parse_array_buffer_for_normal(buffer):
+        view = memoryview(buffer)
+        header_length, = struct.unpack_from('<H', view, 0)
+        json_data = view[4:4 + header_length]
+        binary_data = view[4 + header_length:]
 
-        decoded_data = decoder.decode(binary_data, decoded_json['data'])
+        return json_codec.loads(json_data), binary_data
+    @staticmethod
+    def parse_array_buffer_for_lidar(buffer):
+        view = memoryview(buffer)
+        header_length, = struct.unpack_from('<I', view, 0)
+        json_data = view[8:8 + header_length]
+        binary_data = view[8 + header_length:]
 
-        decoded_json['data']['data'] = decoded_data
-        return decoded_json
+        return json_codec.loads(json_data), binary_data
+    @staticmethod
+    def deal_array_buffer_for_normal(buffer, lidar_filter=None):
+        decoded_json, binary_data = WebRTCDataChannel.parse_array_buffer_for_normal(buffer)
+        return WebRTCDataChannel.decode_array_buffer(decoded_json, binary_data, lidar_filter)
+    @staticmethod
+    def deal_array_buffer_for_lidar(buffer, lidar_filter=None):
+        decoded_json, binary_data = WebRTCDataChannel.parse_array_buffer_for_lidar(buffer)
+        return WebRTCDataChannel.decode_array_buffer(decoded_json, binary_data, lidar_filter)
 
     
     #Should turn it on when subscribed to ulidar topic
@@ -14,8 +14,7 @@ from .constants import DATA_CHANNEL_TYPE, WebRTCConnectionMethod
 from .util import fetch_public_key, fetch_token, fetch_turn_server_info, print_status
 from .multicast_scanner import discover_ip_sn
 
-# # Enable logging for debugging
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 class Go2WebRTCConnection:
     def __init__(self, connectionMethod: WebRTCConnectionMethod, serialNumber=None, ip=None, username=None, password=None) -> None:
@@ -169,7 +168,7 @@ class Go2WebRTCConnection:
         
         @self.pc.on("track")
         async def on_track(track):
-            logging.info("Track recieved: %s", track.kind)
+            logger.info("Track recieved: %s", track.kind)
 
             if track.kind == "video":
                 #await for the first frame, #ToDo make the code more nicer
@@ -183,7 +182,7 @@ class Go2WebRTCConnection:
             #         frame = await track.recv()
             #         await self.audio.frame_handler(frame)
 
-        logging.info("Creating offer...")
+        logger.info("Creating offer...")
         await self.wait_for_ip(self.ip)
         offer = await self.pc.createOffer()
         await self.pc.setLocalDescription(offer)
@@ -241,7 +240,7 @@ class Go2WebRTCConnection:
             "token": self.token
         }
 
-        logging.debug("Local SDP created: %s", sdp_offer_json)
+        logger.debug("Local SDP created: %s", sdp_offer_json)
 
         peer_answer_json = send_sdp_to_remote_peer(self.sn, json.dumps(sdp_offer_json), self.token, self.public_key)
 
@@ -2,6 +2,8 @@ import logging
 from .webrtc_datachannel import WebRTCDataChannel
 from aiortc import RTCPeerConnection
 
+logger = logging.getLogger(__name__)
+
 class WebRTCVideoChannel:
     def __init__(self, pc:RTCPeerConnection, datachannel:WebRTCDataChannel) -> None:
         self.pc = pc
@@ -20,15 +22,15 @@ class WebRTCVideoChannel:
         if callable(callback):
             self.track_callbacks.append(callback)
         else:
-            logging.warning(f"Callback {callback} is not callable.")  
+            logger.warning(f"Callback {callback} is not callable.")  
     
     async def track_handler(self, track):
-        logging.info("Receiving video frame")
+        logger.info("Receiving video frame")
         # Trigger all registered callbacks
         for callback in self.track_callbacks:
             try:
                 # Call each callback function and pass the track
                 await callback(track)
             except Exception as e:
-                logging.error(f"Error in callback {callback}: {e}")
+                logger.error(f"Error in callback {callback}: {e}")
     
\ No newline at end of file
@@ -1,13 +1,12 @@
 import asyncio
 #import base64
 import json
-import random
-import time
 #import threading
 #import cv2
 #import numpy as np
 from queue import Queue
 from go2_webrtc_driver.webrtc_driver import Go2WebRTCConnection, WebRTCConnectionMethod
+from go2_webrtc_driver.constants import SPORT_CMD
 #from aiortc import MediaStreamTrack
 
 class RobotServer:
@@ -89,11 +88,15 @@ class RobotServer:
         if not self.conn:
             print("Keine Verbindung zum Roboter. Bitte zuerst verbinden.")
             return
-        generated_id = int(time.time() * 1000) % 2147483648 + random.randint(0, 1000)
+        if api_id == SPORT_CMD["Move"] and parameter:
+            # Joystick moves go through the scheduler, only the latest is sent
+            move = json.loads(parameter)
+            self.conn.datachannel.motion.set_target(move["x"], move["y"], move["z"])
+            return
         request_payload = {
             "header": {
                 "identity": {
-                    "id": generated_id,
+                    "id": self.conn.datachannel.pub_sub.request_ids.next_id(),
                     "api_id": api_id
                 }
             },
@@ -106,9 +109,9 @@ class RobotServer:
             print("Keine Verbindung zum Roboter. Status-Updates nicht möglich.")
             return
 
-        def status_callback(message):
+        async def status_callback(message):
             self.robot_status = message["data"]
-            self.send_status_to_clients()
+            await self.send_status_to_clients()
 
         try:
             self.conn.datachannel.pub_sub.subscribe("rt/lf/lowstate", status_callback)
@@ -116,12 +119,12 @@ class RobotServer:
         except Exception as e:
             print(f"Fehler beim Abonnieren von Status-Updates: {e}")
 
-    def send_status_to_clients(self):
+    async def send_status_to_clients(self):
         status_message = json.dumps({"type": "status_update", "data": self.robot_status}) + '\n'
-        for client in self.clients:
+        for client in list(self.clients):
             try:
                 client.write(status_message.encode())
-                asyncio.create_task(client.drain())
+                await client.drain()
             except Exception as e:
                 print(f"Fehler beim Senden des Status-Updates an Client: {e}")
 
@@ -5,7 +5,7 @@ setup(
     version='1.0.0',
     author='m.fritsche',
     author_email='m.fritsche@security-robotics.de',
-    packages=find_packages(),
+    packages=find_packages(exclude=("benchmarks", "benchmarks.*")),
     install_requires=[
         'aiortc',
         'pycryptodome',
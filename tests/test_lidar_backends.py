@@ -0,0 +1,39 @@
+"""The "wasm" and "numpy" LidarDecoder backends agree bit for bit on the corpus."""
+import json
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("wasmtime")
+pytest.importorskip("lz4")
+
+from go2_webrtc_driver.lidar.lidar_decoder import LidarDecoder, OUTPUTS
+from benchmarks.lidar_corpus import load_corpus
+
+
+def split_lidar_message(raw):
+    """JSON header and compressed body of a corpus frame, as parse_array_buffer_for_lidar."""
+    header_length, = struct.unpack_from("<I", raw, 4)
+    return json.loads(raw[12:12 + header_length]), raw[12 + header_length:]
+
+
+@pytest.fixture(scope="module")
+def decoders():
+    return [LidarDecoder(backend="wasm", use_cache=False), LidarDecoder(backend="numpy")]
+
+
+@pytest.mark.parametrize("output", OUTPUTS)
+@pytest.mark.parametrize("index", range(len(load_corpus())))
+def test_backends_identical(decoders, output, index):
+    message, payload = split_lidar_message(load_corpus()[index])
+    expected, actual = [decoder.decode(payload, message["data"], output=output) for decoder in decoders]
+
+    assert expected.keys() == actual.keys()
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray):
+            assert actual[key].dtype == value.dtype, key
+            assert actual[key].shape == value.shape, key
+            assert actual[key].tobytes() == value.tobytes(), key
+        else:
+            assert actual[key] == value, key
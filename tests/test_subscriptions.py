@@ -0,0 +1,81 @@
+"""Overflow policies of TopicStream."""
+import asyncio
+import logging
+
+import pytest
+
+from go2_webrtc_driver.msgs.subscriptions import TopicStream
+
+
+def fill(stream, count):
+    for i in range(count):
+        stream.deliver(i)
+
+
+async def drain(stream):
+    messages = []
+    while stream.lag:
+        messages.append(await stream.__anext__())
+    return messages
+
+
+def test_drop_oldest_keeps_newest():
+    stream = TopicStream("t", maxsize=3, policy="drop_oldest")
+    fill(stream, 5)
+    assert asyncio.run(drain(stream)) == [2, 3, 4]
+    assert stream.stats()["dropped"] == 2
+
+
+def test_conflate_replaces_newest():
+    stream = TopicStream("t", maxsize=2, policy="conflate")
+    fill(stream, 5)
+    assert asyncio.run(drain(stream)) == [0, 4]
+    assert stream.stats()["dropped"] == 3
+
+
+def test_conflate_single_slot_is_latest():
+    stream = TopicStream("t", maxsize=1, policy="conflate")
+    fill(stream, 10)
+    assert asyncio.run(drain(stream)) == [9]
+
+
+def test_block_grows_past_maxsize():
+    stream = TopicStream("t", maxsize=2, policy="block")
+    fill(stream, 15)
+    assert asyncio.run(drain(stream)) == list(range(15))
+    assert stream.stats()["dropped"] == 0
+    assert stream.stats()["max_lag"] == 15
+
+
+def test_block_is_capped_with_warning(caplog):
+    stream = TopicStream("t", maxsize=2, policy="block", block_limit=4)
+    with caplog.at_level(logging.WARNING, logger="go2_webrtc_driver.msgs.subscriptions"):
+        fill(stream, 10)
+    assert stream.lag == 4
+    assert stream.stats()["dropped"] == 6
+    assert len(caplog.records) == 1
+    assert asyncio.run(drain(stream)) == [6, 7, 8, 9]
+
+
+def test_block_limit_below_maxsize_rejected():
+    with pytest.raises(ValueError):
+        TopicStream("t", maxsize=4, policy="block", block_limit=2)
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        TopicStream("t", policy="unbounded")
+
+
+def test_close_ends_iteration():
+    async def consume(stream):
+        messages = []
+        async for message in stream:
+            messages.append(message)
+            if message == 1:
+                stream.close()
+        return messages
+
+    stream = TopicStream("t", maxsize=4)
+    fill(stream, 2)
+    assert asyncio.run(consume(stream)) == [0, 1]